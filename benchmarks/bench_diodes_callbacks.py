@@ -0,0 +1,45 @@
+"""
+Measures the latency and throughput of the Diodes callback path on the clock of the simulated DAQmx controller.
+
+DAQ_0DViewer_Diodes.grab_data registers its read_data callback and starts the task in live mode: each callback reads
+its block in place into the ring buffer and emits the average of the last N_AVERAGE blocks, while the simulated clock
+fires a callback every Nsamples / frequency seconds.
+
+Run with: python benchmarks/bench_diodes_callbacks.py
+"""
+import time
+
+import numpy as np
+
+from bench_diodes_read import make_plugin
+
+N_AVERAGE = 10
+N_CHANNELS = 3
+DURATION = 2.  # s per configuration
+
+
+def run(frequency, n_samples):
+    plugin = make_plugin(N_CHANNELS, n_samples, frequency, N_AVERAGE)
+    controller = plugin.controller_diodes['ai']
+    start = time.perf_counter()
+    plugin.grab_data(Naverage=N_AVERAGE, live=True)
+    time.sleep(DURATION)
+    plugin.stop()
+    elapsed = time.perf_counter() - start
+    latencies = np.array(controller.latencies) * 1e3
+    return controller.callbacks / elapsed, frequency / n_samples, np.percentile(latencies, [50, 99]), \
+        controller.late_callbacks
+
+
+def main():
+    print(f'{N_CHANNELS} channels, averaging over {N_AVERAGE} blocks, {DURATION} s per configuration')
+    print(f'{"frequency":>9} {"Nsamples":>8} {"callbacks/s":>11} {"expected":>8} {"p50 (ms)":>8} {"p99 (ms)":>8} '
+          f'{"late":>5}')
+    for frequency in [25000, 250000]:
+        for n_samples in [100, 1000, 8000]:
+            rate, expected, (p50, p99), late = run(frequency, n_samples)
+            print(f'{frequency:>9} {n_samples:>8} {rate:>11.1f} {expected:>8.1f} {p50:>8.3f} {p99:>8.3f} {late:>5}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares the Diodes acquisition callback paths against the simulated DAQmx controller:
+
+* legacy: DAQmx.readAnalog allocating a new array, reshaped and accumulated into a running average
+* in place: DAQ_0DViewer_Diodes.read_data, reading the samples with read_analog_into directly into the next block of
+  the preallocated ring buffer
+
+Both paths emit the average of every N_AVERAGE blocks through DAQ_0DViewer_Diodes.emit_data.
+
+Run with: python benchmarks/bench_diodes_read.py
+"""
+import timeit
+
+import numpy as np
+
+from pymodaq_plugins_ftir.daq_viewer_plugins.plugins_0D.daq_0Dviewer_Diodes import DAQ_0DViewer_Diodes
+from pymodaq_plugins_ftir.hardware.simulated_daqmx import SimulatedDAQmx
+
+N_AVERAGE = 10
+N_CALLBACKS = 1000
+ACQUISITIONS = {1: 'Diff', 2: 'Monitor', 3: 'All'}  # acquisition setting of the Diodes plugin per number of channels
+
+
+def make_plugin(n_channels, n_samples, frequency=25000, n_average=N_AVERAGE):
+    """DAQ_0DViewer_Diodes in live mode on the simulated controller, acquiring n_channels (1 to 3) channels"""
+    plugin = DAQ_0DViewer_Diodes()
+    plugin.controller_diodes = dict(ai=SimulatedDAQmx())
+    plugin.settings.blockSignals(True)  # the tasks are updated once, after all the settings are set
+    plugin.settings.child('diodes', 'acquisition').setValue(ACQUISITIONS[n_channels])
+    plugin.settings.child('diodes', 'frequency').setValue(frequency)
+    plugin.settings.child('diodes', 'Nsamples').setValue(n_samples)
+    plugin.settings.child('diodes', 'history').setValue(n_average)
+    plugin.settings.blockSignals(False)
+    plugin.live = True
+    plugin.Naverage = n_average
+    plugin.update_tasks()
+    return plugin
+
+
+def legacy_path(plugin, n_callbacks=N_CALLBACKS):
+    n_channels, n_samples = plugin.ring_buffer.shape
+    data_tot = np.zeros((n_channels, n_samples))
+    for ind in range(n_callbacks):
+        data = plugin.controller_diodes['ai'].readAnalog(n_channels, plugin.clock_settings_ai)
+        data_tot += 1 / plugin.Naverage * data.reshape(n_channels, n_samples)
+        if (ind + 1) % plugin.Naverage == 0:
+            plugin.emit_data(data_tot)
+            data_tot = np.zeros((n_channels, n_samples))
+
+
+def in_place_path(plugin, n_callbacks=N_CALLBACKS):
+    """Calls the acquisition callback of the plugin n_callbacks times"""
+    for ind in range(n_callbacks):
+        plugin.read_data(None, 0)
+
+
+def main():
+    print(f'{N_CALLBACKS} callbacks, averaging over {N_AVERAGE} blocks (best of 5, µs per callback)')
+    print(f'{"channels":>8} {"Nsamples":>8} {"legacy":>10} {"in place":>10} {"gain":>6}')
+    for n_channels in [1, 3]:
+        for n_samples in [100, 1000, 8000, 50000]:
+            plugin = make_plugin(n_channels, n_samples)
+            legacy = min(timeit.repeat(lambda: legacy_path(plugin), number=1, repeat=5))
+            in_place = min(timeit.repeat(lambda: in_place_path(plugin), number=1, repeat=5))
+            print(f'{n_channels:>8} {n_samples:>8} {legacy / N_CALLBACKS * 1e6:>10.2f} '
+                  f'{in_place / N_CALLBACKS * 1e6:>10.2f} {legacy / in_place:>6.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmarks of the FTIR processing stages and of the Diodes accumulation path.
+
+The interferograms are generated with the AutocoMock signal model (hardware.autoco_model) from 4k to 1M points and
+processed either one by one (FTIRPipeline.process) or in batches (FTIRPipeline.process_batch). The duration of each
+stage is read from the pipeline timings, keeping the best of the repeats. The Diodes accumulation (in place DAQ read
+into the ring buffer and averaging, see bench_diodes_read.py) is timed per callback of the Diodes plugin on the
+simulated controller.
+
+The results are stored in benchmarks/results/<commit>.json so that the commits can be compared:
+
+    python benchmarks/bench_pipeline.py                    # runs and saves the results of the checked out commit
+    python benchmarks/bench_pipeline.py --compare abc1234  # also prints the ratios to the results of commit abc1234
+    python benchmarks/bench_pipeline.py --quick            # traces up to 64k points and fewer repeats
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+import scipy
+
+from pymodaq_plugins_ftir.hardware.autoco_model import autoco_trace
+from pymodaq_plugins_ftir.processing import FTIRPipeline
+
+from bench_diodes_read import in_place_path, make_plugin
+
+RESULTS_DIR = Path(__file__).parent.joinpath('results')
+SIZES = [2 ** 12, 2 ** 14, 2 ** 16, 2 ** 18, 2 ** 20]
+QUICK_SIZES = SIZES[:3]
+BATCH_POINTS = 2 ** 22  # total number of points of a batch, with 2 to 16 traces
+DIODES_MAX_SIZE = 2 ** 18  # the ring buffer keeps 10 blocks of each channel
+DIODES_CHANNELS = 2  # signal and reference
+SCALING = 0.09186  # fs, as in AutocoMock
+CONFIGURATIONS = {'complex': dict(fft_mode='complex'), 'real': dict(fft_mode='real')}
+SLOWER = 1.2  # ratio above which a comparison is flagged
+
+
+def make_traces(npts, n_scans=None, seed=0):
+    """Traces of the AutocoMock model (50 fs envelope) with noise and, for a batch, random rolls of the ZPD"""
+    rng = np.random.default_rng(seed)
+    trace = autoco_trace(np.arange(npts), dx=50., scaling=SCALING)
+    if n_scans is None:
+        return trace + 0.01 * rng.random(npts)
+    rolls = rng.integers(-100, 101, n_scans)
+    return np.stack([np.roll(trace, roll) for roll in rolls]) + 0.01 * rng.random((n_scans, npts))
+
+
+def time_pipeline(pipeline, y, repeat):
+    """Best duration (s) of each stage and of the whole chain over repeat runs"""
+    process = pipeline.process_batch if y.ndim == 2 else pipeline.process
+    best = {}
+    for ind in range(repeat):
+        start = time.perf_counter()
+        process(y)
+        timings = dict(pipeline.timings, total=time.perf_counter() - start)
+        best = {key: min(value, best.get(key, np.inf)) for key, value in timings.items()}
+    return best
+
+
+def time_diodes(n_samples, repeat, n_callbacks=50):
+    """Best duration (s) of one callback of the Diodes plugin, set up before timing"""
+    plugin = make_plugin(DIODES_CHANNELS, n_samples)
+    durations = []
+    for ind in range(repeat):
+        start = time.perf_counter()
+        in_place_path(plugin, n_callbacks)
+        durations.append((time.perf_counter() - start) / n_callbacks)
+    return min(durations)
+
+
+def run(sizes, repeat):
+    results = {}
+    for npts in sizes:
+        single = make_traces(npts)
+        n_scans = int(np.clip(BATCH_POINTS // npts, 2, 16))
+        batch = make_traces(npts, n_scans)
+        for name, configuration in CONFIGURATIONS.items():
+            pipeline = FTIRPipeline(scaling=SCALING, **configuration)
+            for mode, y in (('single', single), (f'batch{n_scans}', batch)):
+                for stage, duration in time_pipeline(pipeline, y, repeat).items():
+                    results[f'pipeline/{name}/{mode}/{npts}/{stage}'] = duration
+        if npts <= DIODES_MAX_SIZE:
+            results[f'diodes/{DIODES_CHANNELS}ch/{npts}/callback'] = time_diodes(npts, repeat)
+        print(f'{npts} points done')
+    return results
+
+
+def git_commit():
+    """Short hash of the checked out commit and whether the tracked files were modified, ('unknown', False) if any
+    git command fails"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True, cwd=Path(__file__).parent).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+        return commit, status != ''
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def save(results, output_dir):
+    commit, dirty = git_commit()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir.joinpath(f'{commit}{"-dirty" if dirty else ""}.json')
+    with open(path, 'w') as f:
+        json.dump(dict(commit=commit, dirty=dirty, date=datetime.datetime.now().isoformat(timespec='seconds'),
+                       machine=platform.platform(), processor=platform.processor(),
+                       python=platform.python_version(), numpy=np.__version__, scipy=scipy.__version__,
+                       results=results), f, indent=2)
+    return path
+
+
+def load(reference, output_dir):
+    """Results of a previous run, given by its commit (file name in the output directory) or by its path"""
+    path = Path(reference)
+    if not path.is_file():
+        path = output_dir.joinpath(f'{reference}.json')
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, reference):
+    print(f'{"benchmark":<40} {reference["commit"]:>12} {"current":>12} {"ratio":>7}')
+    for key, duration in results.items():
+        if key not in reference['results']:
+            continue
+        ratio = duration / reference['results'][key]
+        flag = '  slower' if ratio > SLOWER else ''
+        print(f'{key:<40} {reference["results"][key] * 1e3:>10.3f}ms {duration * 1e3:>10.3f}ms {ratio:>7.2f}{flag}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the FTIR processing and of the Diodes acquisition')
+    parser.add_argument('--quick', action='store_true', help=f'traces up to {QUICK_SIZES[-1]} points, 3 repeats')
+    parser.add_argument('--repeat', type=int, default=7, help='number of runs of each benchmark, the best is kept')
+    parser.add_argument('--output', type=Path, default=RESULTS_DIR, help='directory of the json results')
+    parser.add_argument('--compare', help='commit (or json file) of the results to compare with')
+    args = parser.parse_args()
+
+    reference = load(args.compare, args.output) if args.compare is not None else None  # before it is overwritten
+    results = run(QUICK_SIZES if args.quick else SIZES, 3 if args.quick else args.repeat)
+    print(f'Results saved in {save(results, args.output)}')
+    if reference is not None:
+        compare(results, reference)
+    else:
+        for key, duration in results.items():
+            print(f'{key:<40} {duration * 1e3:>10.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,21 @@
+import ctypes
 import numpy as np
-from qtpy.QtCore import QThread
 from pymodaq.utils.logger import set_logger, get_module_name
 from pymodaq.utils.data import DataFromPlugins,  Axis, DataToExport
 from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters, main
 
-from pymodaq_plugins_daqmx.hardware.national_instruments.daqmx import DAQmx, ClockSettings, AIChannel
+try:
+    from pymodaq_plugins_daqmx.hardware.national_instruments.daqmx import DAQmx, ClockSettings, AIChannel
+    from PyDAQmx import DAQmx_Val_GroupByChannel, int32
+    DAQMX_AVAILABLE = True
+except (ImportError, NotImplementedError, OSError):  # PyDAQmx raises if the NI-DAQmx driver is not installed
+    from ctypes import c_int32 as int32
+    from pymodaq_plugins_ftir.hardware.simulated_daqmx import SimulatedDAQmx as DAQmx, ClockSettings, AIChannel, \
+        DAQmx_Val_GroupByChannel
+    DAQMX_AVAILABLE = False
 from pymodaq_plugins_ftir import Config
+from pymodaq_plugins_ftir.hardware.ring_buffer import RingBuffer
+from pymodaq_plugins_ftir.hardware.simulated_daqmx import SimulatedDAQmx
 
 logger = set_logger(get_module_name(__file__))
 
@@ -16,7 +26,11 @@ ai_monitor_plus = config('diodes', 'ai_monitor_plus')
 ai_monitor_minus = config('diodes', 'ai_monitor_minus')
 ai_diff = config('diodes', 'ai_diff')
 
-DEBUG = False
+DEBUG = False  # if True, the simulated DAQmx controller is used even if the NI-DAQmx driver is available
+SIMULATED = DEBUG or not DAQMX_AVAILABLE
+if SIMULATED:
+    SimulatedDAQmx.devices = [device_ai]
+    logger.info('Using the simulated DAQmx controller')
 
 
 class DAQ_0DViewer_Diodes(DAQ_Viewer_base):
@@ -27,6 +41,8 @@ class DAQ_0DViewer_Diodes(DAQ_Viewer_base):
             {'title': 'Acquisition:', 'name': 'acquisition', 'type': 'list', 'limits': ['Monitor', 'Diff', 'All']},
             {'title': 'Frequency Acq.:', 'name': 'frequency', 'type': 'int', 'value': 1000, 'min': 1},
             {'title': 'Nsamples:', 'name': 'Nsamples', 'type': 'int', 'value': 100, 'default': 100, 'min': 1},
+            {'title': 'History depth:', 'name': 'history', 'type': 'int', 'value': 1, 'default': 1, 'min': 1,
+             'tip': 'Number of acquired blocks kept in the ring buffer, raised to the number of averages if lower'},
             {'title': 'Monitor +:', 'name': 'ai_monitor_plus', 'type': 'list',
              'limits': DAQmx.get_NIDAQ_channels(source_type='Analog_Input'), 'value': f'{device_ai}/{ai_monitor_plus}'},
             {'title': 'Monitor -:', 'name': 'ai_monitor_minus', 'type': 'list',
@@ -41,7 +57,9 @@ class DAQ_0DViewer_Diodes(DAQ_Viewer_base):
         super().__init__(parent, params_state)
 
         self.channels_ai = None
-        self.data_tot = None
+        self.ring_buffer: RingBuffer = None
+        self._samples_read = int32()
+        self._samples_read_pointer = ctypes.pointer(self._samples_read)
         self.live = False
         self.Naverage = 1
         self.ind_average = 0
@@ -69,7 +87,7 @@ class DAQ_0DViewer_Diodes(DAQ_Viewer_base):
         """
 
         if self.is_master:
-            self.controller_diodes = dict(ai=DAQmx())
+            self.controller_diodes = dict(ai=SimulatedDAQmx() if SIMULATED else DAQmx())
             #####################################
 
             self.settings.child('diodes', 'ai_monitor_plus').setValue(f'{device_ai}/{ai_monitor_plus}')
@@ -114,6 +132,21 @@ class DAQ_0DViewer_Diodes(DAQ_Viewer_base):
                                                repetition=self.live)
 
         self.controller_diodes['ai'].update_task(self.channels_ai, self.clock_settings_ai)
+        self.update_ring_buffer()
+
+    def update_ring_buffer(self):
+        """(Re)allocates the ring buffer only if the acquisition shape, the history depth or Naverage changed
+
+        The ring buffer keeps the running sum of the last Naverage blocks, so it holds at least Naverage blocks
+        """
+        depth = self.settings['diodes', 'history']
+        if depth < self.Naverage:
+            logger.info(f'History depth of {depth} blocks raised to the number of averages: {self.Naverage}')
+            depth = self.Naverage
+        shape = (len(self.channels_ai), self.clock_settings_ai.Nsamples)
+        if self.ring_buffer is None or self.ring_buffer.shape != shape or self.ring_buffer.depth != depth or \
+                self.ring_buffer.window != self.Naverage:
+            self.ring_buffer = RingBuffer(*shape, depth=depth, window=self.Naverage)
 
     def close(self):
         """
@@ -147,34 +180,43 @@ class DAQ_0DViewer_Diodes(DAQ_Viewer_base):
             self.update_tasks()
 
         self.ind_average = 0
-        self.data_tot = np.zeros((len(self.channels_ai), self.clock_settings_ai.Nsamples))
+        self.ring_buffer.reset()
 
         while not self.controller_diodes['ai'].isTaskDone():
             self.stop()
-        if not DEBUG:
-            if self.controller_diodes['ai'].c_callback is None:
-                self.controller_diodes['ai'].register_callback(self.read_data, 'Nsamples',
-                                                               self.clock_settings_ai.Nsamples)
+        if self.controller_diodes['ai'].c_callback is None:
+            self.controller_diodes['ai'].register_callback(self.read_data, 'Nsamples',
+                                                           self.clock_settings_ai.Nsamples)
         self.controller_diodes['ai'].task.StartTask()
-        if DEBUG:
-            QThread.msleep(500)
-            self.read_data(None, 0)
+
+    def read_analog_into(self, buffer):
+        """Fills in place the channel major buffer of shape (n_channels, Nsamples) with the samples of the running task
+
+        Contrary to DAQmx.readAnalog, nothing is allocated: the samples are read directly into the given C contiguous
+        float64 array (typically the next block of the ring buffer)
+        """
+        n_samples = buffer.shape[-1]
+        timeout = n_samples / self.clock_settings_ai.frequency * 2  # twice the time it should take to acquire
+        self.controller_diodes['ai'].task.ReadAnalogF64(n_samples, timeout, DAQmx_Val_GroupByChannel, buffer,
+                                                        buffer.size, self._samples_read_pointer, None)
+        if self._samples_read.value != n_samples:
+            raise IOError(f'Insufficient number of samples have been read:{self._samples_read.value}/{n_samples}')
 
     def read_data(self, taskhandle, status, samples=0, callbackdata=None):
         #print(f'going to read {self.clock_settings_ai.Nsamples} samples, callbakc {samples}')
-        data = self.controller_diodes['ai'].readAnalog(len(self.channels_ai), self.clock_settings_ai)
+        self.read_analog_into(self.ring_buffer.next_block())
         if not self.live:
             self.stop()
         self.ind_average += 1
 
-        self.data_tot += 1 / self.Naverage * data.reshape(len(self.channels_ai), self.clock_settings_ai.Nsamples)
+        self.ring_buffer.commit()
 
         logger.debug('Reading data from task')
 
         if self.ind_average == self.Naverage:
-            self.emit_data(self.data_tot)
+            self.emit_data(self.ring_buffer.mean(self.Naverage))
+            self.ring_buffer.clear_sum()  # the next average is over the next Naverage blocks
             self.ind_average = 0
-            self.data_tot = np.zeros((len(self.channels_ai), self.clock_settings_ai.Nsamples))
 
         return 0  #mandatory for the PyDAQmx callback
 
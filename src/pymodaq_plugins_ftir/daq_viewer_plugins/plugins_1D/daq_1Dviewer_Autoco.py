@@ -1,3 +1,5 @@
+import threading
+import time
 import numpy as np
 from qtpy.QtCore import QThread, QObject, Slot
 from easydict import EasyDict as edict
@@ -6,15 +8,19 @@ from pymodaq.utils.logger import set_logger, get_module_name
 from pymodaq.utils.data import DataFromPlugins,  Axis, DataToExport
 from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters, main
 from pymodaq.utils.parameter.utils import iter_children
-from pymodaq_plugins_daqmx.hardware.national_instruments.daqmx import DAQmx, ClockSettings, AIChannel
 from pymodaq_plugins_ftir import Config
+from pymodaq_plugins_ftir.hardware.position_sampler import PositionSampler
+# DAQmx, ClockSettings and AIChannel are the simulated ones if the NI-DAQmx driver is not available
 from pymodaq_plugins_ftir.daq_viewer_plugins.plugins_0D.daq_0Dviewer_Diodes import DAQ_0DViewer_Diodes, device_ai, \
-    ai_monitor_plus, ai_monitor_minus, ai_diff
+    ai_monitor_plus, ai_monitor_minus, ai_diff, DAQmx, ClockSettings, AIChannel
 from pymodaq_plugins_smaract.daq_move_plugins.daq_move_SmarActSCU import DAQ_Move_SmarActSCU as DAQ_Move_SmarAct
 logger = set_logger(get_module_name(__file__))
 
 config = Config()
 
+POLL_PERIOD_MIN = 0.001  # s, shortest period between two stage position readings
+POLL_PERIOD_MAX = 0.05  # s, longest period between two stage position readings
+
 
 class DAQ_1DViewer_Autoco(DAQ_0DViewer_Diodes, DAQ_Move_SmarAct, QObject):
     """
@@ -28,6 +34,14 @@ class DAQ_1DViewer_Autoco(DAQ_0DViewer_Diodes, DAQ_Move_SmarAct, QObject):
         {"title": "positions:", "name": "positions", "type": "group", "children": [
             {"title": "Start:", "name": "start", "type": "float", "value": config('delay', 'positions', 'start')},
             {"title": "Stop:", "name": "stop", "type": "float", "value": config('delay', 'positions', 'stop')},
+            {"title": "Move timeout (s):", "name": "move_timeout", "type": "float", "value": 10., "min": 0.,
+             "tip": "Maximum time allowed for the stage to reach the start position of a sweep"},
+            {"title": "Bidirectional:", "name": "bidirectional", "type": "bool", "value": False,
+             "tip": "Acquire on both the start->stop and stop->start strokes, backward traces are time reversed"},
+            {"title": "Record position:", "name": "record_position", "type": "bool", "value": False,
+             "tip": "Samples the stage position in a background thread during the sweep and emits it, interpolated at"
+                    " each DAQ sample, as an extra Stage position trace"},
+            {"title": "Position rate (Hz):", "name": "position_rate", "type": "float", "value": 200., "min": 1.},
             {"title": "Go to:", "name": "go_to", "type": "float", "value": config('delay', 'positions', 'go_to')},
             {"title": "Move to:", "name": "move_to", "type": "bool_push", "value": False},
             {"title": "Move Home:", "name": "move_home", "type": "bool_push", "value": False},
@@ -41,6 +55,11 @@ class DAQ_1DViewer_Autoco(DAQ_0DViewer_Diodes, DAQ_Move_SmarAct, QObject):
 
         self.controller_diodes = None
         self.controller = None
+        self.sweep_direction = 'forward'
+        # the SmarAct controller is used from the plugin thread and from the position sampler thread
+        self._controller_lock = threading.RLock()
+        self.position_sampler = PositionSampler(self.get_actuator_value)
+        self._sweep_start_time = 0.
 
     def commit_settings(self, param):
         """
@@ -52,7 +71,20 @@ class DAQ_1DViewer_Autoco(DAQ_0DViewer_Diodes, DAQ_Move_SmarAct, QObject):
         elif param.name() in iter_children(self.settings.child('diodes'), []):
             self.update_tasks()
         else:
-            DAQ_Move_SmarAct.commit_settings(self, param)
+            with self._controller_lock:
+                DAQ_Move_SmarAct.commit_settings(self, param)
+
+    def get_actuator_value(self):
+        with self._controller_lock:
+            return DAQ_Move_SmarAct.get_actuator_value(self)
+
+    def move_abs(self, position):
+        with self._controller_lock:
+            DAQ_Move_SmarAct.move_abs(self, position)
+
+    def move_home(self):
+        with self._controller_lock:
+            DAQ_Move_SmarAct.move_home(self)
 
     def ini_detector(self, controller=None):
         """Detector communication initialization
@@ -106,51 +138,134 @@ class DAQ_1DViewer_Autoco(DAQ_0DViewer_Diodes, DAQ_Move_SmarAct, QObject):
         """
         Terminate the communication protocol
         """
+        self.position_sampler.stop()
         DAQ_Move_SmarAct.close(self)
         ##
 
+    def sweep_positions(self):
+        """Returns the (start, stop) stage positions of the next sweep given its direction"""
+        if self.sweep_direction == 'backward':
+            return self.settings['positions', 'stop'], self.settings['positions', 'start']
+        return self.settings['positions', 'start'], self.settings['positions', 'stop']
+
     def grab_data(self, Naverage=1, **kwargs):
         self.Naverage_asked = Naverage
-        self.move_abs(self.settings['positions', 'start'])
+        if not self.settings['positions', 'bidirectional']:
+            self.sweep_direction = 'forward'
+        start, stop = self.sweep_positions()
+        self.move_abs(start)
 
-        while not np.abs(self.get_actuator_value() - self.settings['positions', 'start']) < self.settings['epsilon']:
-            QThread.msleep(100)
-        self.stage_done(self.get_actuator_value())
+        try:
+            position = self.wait_for_position(start, self.settings['positions', 'move_timeout'])
+        except TimeoutError as e:
+            self.stop()
+            self.emit_status(ThreadCommand('Update_Status', [getLineInfo() + str(e), 'log']))
+            # NaN traces so that the viewer (and the FTIR app) waiting for this sweep are not blocked
+            self.send_data([np.full((self.clock_settings_ai.Nsamples,), np.nan) for _ in self.channels_ai],
+                           direction=self.sweep_direction)
+            return
+        self.stage_done(position)
+
+    def wait_for_position(self, target: float, timeout: float):
+        """Waits until the stage is within epsilon of target and returns its position
+
+        The position is polled with an adaptive period: half the remaining travel time estimated from the measured
+        stage velocity, clipped between POLL_PERIOD_MIN and POLL_PERIOD_MAX, so that the sweep starts as soon as the
+        hardware is in position without hammering the controller during long moves.
+
+        Raises
+        ------
+        TimeoutError: if the target is not reached within timeout seconds
+        """
+        start_time = last_time = time.perf_counter()
+        position = last_position = self.get_actuator_value()
+        while not np.abs(position - target) < self.settings['epsilon']:
+            now = time.perf_counter()
+            if now - start_time > timeout:
+                raise TimeoutError(f'The stage did not reach {target} within {timeout}s, last position: {position}')
+            speed = np.abs(position - last_position) / (now - last_time) if now > last_time else 0.
+            period = np.abs(position - target) / speed / 2 if speed > 0 else POLL_PERIOD_MIN
+            QThread.usleep(int(1e6 * min(max(period, POLL_PERIOD_MIN), POLL_PERIOD_MAX)))
+
+            last_time, last_position = now, position
+            position = self.get_actuator_value()
+        return position
 
     def stage_done(self, position: float):
-        if np.abs(position - self.settings['positions', 'start']) < self.settings['epsilon']:
-            self.move_abs(self.settings['positions', 'stop'])
+        start, stop = self.sweep_positions()
+        if np.abs(position - start) < self.settings['epsilon']:
+            self.move_abs(stop)
+            if self.settings['positions', 'record_position']:
+                self.position_sampler.rate = self.settings['positions', 'position_rate']
+                self.position_sampler.start()
+            self._sweep_start_time = time.perf_counter()
             super().grab_data(self.Naverage_asked)
 
+    def sample_positions(self, n_samples: int):
+        """Stops the position recording and returns the stage position at each of the n_samples DAQ samples
+
+        The DAQ samples are assumed to be clocked at the diodes frequency from the start of the sweep. Returns None if
+        the position is not recorded or if too few readings are available.
+        """
+        if not self.position_sampler.running:
+            return None
+        self.position_sampler.stop()
+        sample_times = self._sweep_start_time + np.arange(n_samples) / self.settings['diodes', 'frequency']
+        try:
+            return self.position_sampler.positions_at(sample_times)
+        except ValueError as e:
+            logger.warning(f'No stage position trace for this sweep: {str(e)}')
+
     def emit_data(self, data):
         logger.debug('autoco emitting data from task')
-        data_export = [np.array(data[ind]) for ind in range(len(self.channels_ai))]
-        self.move_abs(self.settings['positions', 'start'])
-        self.send_data(data_export)
+        direction = self.sweep_direction
+        position = self.sample_positions(len(data[0]))
+        if direction == 'backward':
+            data_export = [np.array(data[ind][::-1]) for ind in range(len(self.channels_ai))]
+            position = position[::-1] if position is not None else None
+        else:
+            data_export = [np.array(data[ind]) for ind in range(len(self.channels_ai))]
+
+        if self.settings['positions', 'bidirectional']:
+            # the stage is already at the start of the next, reversed, sweep
+            self.sweep_direction = 'backward' if direction == 'forward' else 'forward'
+        else:
+            self.move_abs(self.settings['positions', 'start'])
+        self.send_data(data_export, direction=direction, position=position)
 
-    def send_data(self, datatosend, data_type='0D'):
+    def send_data(self, datatosend, data_type='0D', direction='forward', position=None):
+        """Emits the sweep traces, tagged by the direction of the sweep they come from (forward or backward)
+
+        If given, position is the stage position at each sample and is emitted as an extra Stage position trace
+        """
         logger.debug('autoco sending data from task')
         channels_name = [ch.name for ch in self.channels_ai]
         if self.settings['diodes', 'acquisition'] != 'All':
-            self.dte_signal.emit(DataToExport('all', data=[DataFromPlugins(
+            data = [DataFromPlugins(
                 name='Monitor Diodes',
                 data=datatosend,
-                dim=f'Data1D', labels=channels_name)]))
+                dim=f'Data1D', labels=channels_name, direction=direction)]
         else:
-            self.dte_signal.emit(DataToExport('all', data=[DataFromPlugins(
+            data = [DataFromPlugins(
                 name='Monitor Diodes',
                 data=datatosend[0:2],
-                dim=f'Data1D', labels=channels_name[0:2]),
+                dim=f'Data1D', labels=channels_name[0:2], direction=direction),
                 DataFromPlugins(
                     name='Amplified difference',
                     data=[datatosend[2]],
-                    dim=f'Data1D', labels=[channels_name[2]])
-            ]))
+                    dim=f'Data1D', labels=[channels_name[2]], direction=direction)
+            ]
+        if position is not None:
+            data.append(DataFromPlugins(name='Stage position', data=[position], dim='Data1D',
+                                        labels=['Stage position'], direction=direction))
+        self.dte_signal.emit(DataToExport('all', data=data))
 
     def stop(self):
         try:
+            self.position_sampler.stop()
             self.controller_diodes['ai'].task.StopTask()
-            self.controller.stop_motion()
+            with self._controller_lock:
+                self.controller.stop_motion()
         except:
             pass
         ##############################
@@ -1,11 +1,16 @@
+import threading
+import time
+
 from qtpy.QtCore import QThread
 from qtpy import QtWidgets
 from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters, main
 import numpy as np
 from easydict import EasyDict as edict
-from pymodaq.utils.daq_utils import ThreadCommand, getLineInfo, gauss1D, linspace_step, DataFromPlugins, Axis, l2w
+from pymodaq.utils.daq_utils import ThreadCommand, getLineInfo, linspace_step, DataFromPlugins, Axis
 from pymodaq.utils.parameter.utils import iter_children
 
+from pymodaq_plugins_ftir.hardware.autoco_model import autoco_trace
+
 
 class DAQ_1DViewer_AutocoMock(DAQ_Viewer_base):
     """
@@ -28,6 +33,12 @@ class DAQ_1DViewer_AutocoMock(DAQ_Viewer_base):
             {'title': 'Npts:', 'name': 'Npts', 'type': 'int', 'value': 4096, },
             {'title': 'Index/Delay scaling (fs)', 'name': 'scaling', 'type': 'float', 'value': 0.09186},
         ]},
+        {'title': 'Stress:', 'name': 'stress', 'type': 'group', 'children': [
+            {'title': 'Free running:', 'name': 'free_running', 'type': 'bool', 'value': False,
+             'tip': 'A grab (not a snap) starts emitting frames at the target rate from a background thread, whether'
+                    ' or not the consumers keep up, until stopped'},
+            {'title': 'Frame rate (Hz):', 'name': 'frame_rate', 'type': 'float', 'value': 100., 'min': 0.1},
+        ]},
 
     ]
     hardware_averaging = False
@@ -37,6 +48,21 @@ class DAQ_1DViewer_AutocoMock(DAQ_Viewer_base):
 
         self.x_axis = Axis(label='delay', units='index')
         self.ind_data = 0
+        self.rng = np.random.default_rng()
+        self._template = None
+        self._noise = None
+        self._lock = threading.Lock()  # the template, noise buffer and axis are also used by the free running thread
+        self._stop_event = threading.Event()
+        self._free_running_thread = None
+
+    @property
+    def template(self):
+        """The noiseless trace, only recomputed after a change of the autoco or x_axis settings"""
+        if self._template is None:
+            self._template = autoco_trace(self.x_axis['data'], self.settings['autoco', 'amp'],
+                                          self.settings['autoco', 'dx'], self.settings['autoco', 'n'],
+                                          self.settings['autoco', 'wavelength'], self.settings['x_axis', 'scaling'])
+        return self._template
 
     def commit_settings(self, param):
         """
@@ -52,45 +78,44 @@ class DAQ_1DViewer_AutocoMock(DAQ_Viewer_base):
             set_Mock_data
         """
         if param.name() in iter_children(self.settings.child(('x_axis')), []):
+            with self._lock:
+                self._template = None
             self.set_x_axis()
             self.emit_x_axis()
 
-        else:
+        elif param.name() in iter_children(self.settings.child(('autoco')), []):
+            with self._lock:
+                self._template = None
             self.set_Mock_data()
 
+        elif param.name() == 'free_running' and not param.value():
+            self.stop_free_running()
+
     def set_Mock_data(self):
         """
-            For each parameter of the settings tree :
-                * compute linspace numpy distribution with local parameters values
-                * shift right the current data of ind_data position
-                * add computed results to the data_mock list
+            Rolls the cached noiseless template by a random number of samples and adds uniform noise drawn from the
+            Generator of the plugin into a reused buffer
 
             Returns
             -------
             list
                 The computed data_mock list.
         """
-        ind = -1
-        self.data_mock = []
-        data = np.zeros(self.x_axis['data'].shape)
-        ind += 1
-
-        data_tmp = self.settings['autoco', 'amp'] *\
-            gauss1D(self.x_axis['data'],
-                    np.mean(self.x_axis['data']),
-                    self.settings['autoco', 'dx'] / self.settings['x_axis', 'scaling'],
-                    self.settings['autoco', 'n'])
-        data_tmp = data_tmp * np.cos(self.x_axis['data'] * self.settings['x_axis', 'scaling'] * l2w(self.settings['autoco', 'wavelength']) )
-
-        data_tmp += self.settings['autoco', 'amp_noise'] * np.random.rand((len(self.x_axis['data'])))
-        data_tmp = np.roll(data_tmp, np.random.randint(-self.settings['rolling'],
-                                                       +self.settings['rolling']+1))
-        self.data_mock.append(data_tmp)
+        with self._lock:
+            template = self.template
+            if self._noise is None or self._noise.shape != template.shape:
+                self._noise = np.zeros(template.shape)
+            data_tmp = np.roll(template, self.rng.integers(-self.settings['rolling'], self.settings['rolling'] + 1))
+            self.rng.random(out=self._noise)
+            self._noise *= self.settings['autoco', 'amp_noise']
+            data_tmp += self._noise
+        self.data_mock = [data_tmp]
         return self.data_mock
 
     def set_x_axis(self):
         Npts = self.settings.child('x_axis', 'Npts').value()
-        self.x_axis['data'] = linspace_step(0, Npts-1, 1)
+        with self._lock:
+            self.x_axis['data'] = linspace_step(0, Npts-1, 1)
 
         self.emit_x_axis()
 
@@ -133,9 +158,43 @@ class DAQ_1DViewer_AutocoMock(DAQ_Viewer_base):
 
     def close(self):
         """
-            Not implemented.
+            Stops the free running emission if any.
         """
-        pass
+        self.stop_free_running()
+
+    def start_free_running(self):
+        self.stop_free_running()
+        self._stop_event.clear()
+        self._free_running_thread = threading.Thread(target=self._free_run, name='AutocoMockFreeRunning',
+                                                     daemon=True)
+        self._free_running_thread.start()
+
+    def stop_free_running(self):
+        if self._free_running_thread is not None:
+            self._stop_event.set()
+            self._free_running_thread.join()
+            self._free_running_thread = None
+
+    def _free_run(self):
+        """Emits frames on a fixed schedule at the target rate. If the generation falls behind, the schedule is
+        restarted instead of emitting bursts of frames. The achieved rate is reported every second, an error stops the
+        emission and is reported"""
+        next_time = report_time = time.perf_counter()
+        frames = 0
+        try:
+            while not self._stop_event.is_set():
+                self.data_grabed_signal.emit([DataFromPlugins(name='AutocoTrace', data=self.set_Mock_data(),
+                                                              dim='Data1D', labels=['Autoco'], x_axis=self.x_axis)])
+                frames += 1
+                now = time.perf_counter()
+                if now - report_time >= 1.:
+                    self.emit_status(ThreadCommand('Update_Status',
+                                                   [f'Free running at {frames / (now - report_time):.1f} Hz']))
+                    report_time, frames = now, 0
+                next_time = max(next_time + 1 / self.settings['stress', 'frame_rate'], now)
+                self._stop_event.wait(next_time - now)
+        except Exception as e:
+            self.emit_status(ThreadCommand('Update_Status', [getLineInfo() + f'Free running stopped: {str(e)}', 'log']))
 
     def grab_data(self, Naverage=1, **kwargs):
         """
@@ -158,6 +217,11 @@ class DAQ_1DViewer_AutocoMock(DAQ_Viewer_base):
             --------
             set_Mock_data
         """
+        if self.settings['stress', 'free_running'] and kwargs.get('live', False):
+            if self._free_running_thread is None:  # the viewer calls grab_data again after each frame
+                self.start_free_running()
+            return
+
         Naverage = 1
         data_tot = self.set_Mock_data()
         for ind in range(Naverage - 1):
@@ -174,9 +238,9 @@ class DAQ_1DViewer_AutocoMock(DAQ_Viewer_base):
 
     def stop(self):
         """
-            not implemented.
+            Stops the free running emission if any.
         """
-
+        self.stop_free_running()
         return ""
 
 
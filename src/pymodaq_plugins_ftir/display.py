@@ -0,0 +1,122 @@
+"""
+Display decimation of long traces.
+
+Rendering 10^5-10^6 points per curve costs more than the processing, while the screen can only show a few thousand
+columns. The traces are therefore sent to the viewers as a min/max envelope: the visible part of the trace is split
+into one bin per screen pixel and each bin is drawn as a vertical segment between its minimum and maximum, which
+keeps every peak and the full noise band visible. The full resolution arrays are kept for the processing and the
+envelope is recomputed when the user zooms or pans.
+"""
+import numpy as np
+from qtpy import QtCore
+
+from pymodaq.utils import daq_utils as utils
+
+REFRESH_DELAY = 50  # ms, the envelope is recomputed once the view range has been stable for this time
+MIN_BINS = 200
+
+
+def minmax_envelope(x, traces, n_bins, x_range=None):
+    """Min/max envelope of traces sharing the increasing axis x, with n_bins bins over x_range
+
+    Parameters
+    ----------
+    x: (ndarray) the increasing axis of length Npts
+    traces: (ndarray) the traces of shape (Ntraces, Npts)
+    n_bins: (int) the number of bins, typically the width in pixels of the plot
+    x_range: (tuple of 2 floats) the visible interval, the whole axis if None
+
+    Returns
+    -------
+    x_envelope: (ndarray) the starting x value of each bin, repeated twice
+    envelope: (ndarray) of shape (Ntraces, 2 * n_bins) alternating the min and max of each bin. If the visible part
+        is shorter than 2 * n_bins, it is returned without decimation
+    """
+    x = np.asarray(x)
+    traces = np.atleast_2d(traces)
+    start, stop = 0, len(x)
+    if x_range is not None:  # keep one point on each side so that the curve reaches the edges of the view
+        start = max(int(np.searchsorted(x, x_range[0])) - 1, 0)
+        stop = min(int(np.searchsorted(x, x_range[1])) + 1, len(x))
+    npts = stop - start
+    if npts <= 2 * n_bins:
+        return x[start:stop], traces[:, start:stop]
+
+    bin_size = npts // n_bins
+    stop = start + bin_size * n_bins
+    binned = traces[:, start:stop].reshape((traces.shape[0], n_bins, bin_size))
+    envelope = np.empty((traces.shape[0], n_bins, 2), dtype=traces.dtype)
+    np.min(binned, axis=-1, out=envelope[..., 0])
+    np.max(binned, axis=-1, out=envelope[..., 1])
+    return np.repeat(x[start:stop:bin_size], 2), envelope.reshape((traces.shape[0], 2 * n_bins))
+
+
+class DecimatedViewer(QtCore.QObject):
+    """Keeps the full resolution traces of a Viewer1D and displays their min/max envelope at screen resolution
+
+    Parameters
+    ----------
+    viewer: (Viewer1D) the viewer to display into
+    enabled: (bool) if False, the traces are displayed at full resolution
+    timings: (instrumentation.RollingTimings) if not None, the duration of each refresh is recorded as 'display <name>'
+    name: (str) the name of the displayed data
+    """
+
+    def __init__(self, viewer, enabled=True, timings=None, name=''):
+        super().__init__()
+        self.viewer = viewer
+        self.enabled = enabled
+        self.timings = timings
+        self.timer_name = f'display {name}'
+        self._traces = None
+        self._x_axis = None
+        self._labels = None
+        self._displayed_range = None
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(REFRESH_DELAY)
+        self._timer.timeout.connect(self.refresh)
+        self.view_box.sigXRangeChanged.connect(self.view_range_changed)
+
+    @property
+    def view_box(self):
+        return self.viewer.view.plotitem.vb
+
+    def show_data(self, traces, x_axis, labels=None):
+        """Same signature as Viewer1D.show_data, the arrays are kept for later re-decimation"""
+        self._traces = np.atleast_2d(np.asarray(traces))
+        self._x_axis = x_axis
+        self._labels = labels
+        self.refresh()
+
+    def view_range_changed(self, view_box=None, x_range=None):
+        """Schedules a new decimation after a zoom or a pan (not after the range changes due to the display itself)"""
+        if self._traces is not None and self.enabled and self.visible_range() != self._displayed_range:
+            self._timer.start()
+
+    def visible_range(self):
+        """The x interval shown by the viewer, None if the view follows the data (auto range)"""
+        if self.view_box.state['autoRange'][0]:
+            return None
+        return tuple(self.view_box.viewRange()[0])
+
+    def refresh(self):
+        """Sends the envelope of the visible part of the traces to the viewer"""
+        if self._traces is None:
+            return
+        start = self.timings.start() if self.timings is not None else None
+        self._show()
+        if start is not None:
+            self.timings.stop(self.timer_name, start)
+
+    def _show(self):
+        if not self.enabled:
+            self.viewer.show_data(list(self._traces), x_axis=self._x_axis, labels=self._labels)
+            return
+
+        self._displayed_range = self.visible_range()
+        n_bins = max(int(self.view_box.width()), MIN_BINS)
+        x_envelope, envelope = minmax_envelope(self._x_axis['data'], self._traces, n_bins, self._displayed_range)
+        self.viewer.show_data(list(envelope), labels=self._labels,
+                              x_axis=utils.Axis(data=x_envelope, label=self._x_axis['label'],
+                                                units=self._x_axis['units']))
@@ -1,4 +1,5 @@
 import sys
+import time
 from qtpy import QtWidgets, QtGui, QtCore
 from pathlib import Path
 from collections import OrderedDict
@@ -14,9 +15,21 @@ from pymodaq.utils import daq_utils as utils
 from pymodaq.utils.logger import set_logger, get_module_name
 from pymodaq.utils import math_utils as mutils
 from pymodaq.utils.messenger import messagebox
-from pymodaq.utils.h5modules.browsing import browse_data, H5BrowserUtil
+from pymodaq.utils.h5modules.browsing import H5BrowserUtil
+from pymodaq.utils.gui_utils.file_io import select_file
 from scipy.constants import speed_of_light
 from pymodaq_plugins_ftir.utils import Config as ConfigFTIR
+from pymodaq_plugins_ftir.processing import FTIRPipeline
+from pymodaq_plugins_ftir.processing.pipeline import STAGE_PARAMETERS, STAGES
+from pymodaq_plugins_ftir.processing.apodization import APODIZATIONS
+from pymodaq_plugins_ftir.processing.calibration import CALIBRATION_MODES, scaling_from_period
+from pymodaq_plugins_ftir.processing.fft import FFT_MODES, PHASE_CORRECTIONS
+from pymodaq_plugins_ftir.processing.zpd import ZPD_METHODS
+from pymodaq_plugins_ftir.saving import FTIRWriter, H5_BACKENDS
+from pymodaq_plugins_ftir.loading import LazyInterferograms, select_node
+from pymodaq_plugins_ftir.worker import PipelineThread, ProcessingJob
+from pymodaq_plugins_ftir.display import DecimatedViewer
+from pymodaq_plugins_ftir.instrumentation import RollingTimings, TimingsTable
 
 
 config = ConfigFTIR()
@@ -32,7 +45,119 @@ class FTIR(CustomApp):
             {'title': 'Computed Index/Delay scaling (fs)', 'name': 'scaling_computed', 'type': 'float',
              'readonly': True, 'value': 0.09186},
             {'title': 'Index/Delay scaling (fs)', 'name': 'scaling', 'type': 'float', 'value': 0.09186},
-        ]}]
+            {'title': 'Auto calibration', 'name': 'auto_calibration', 'type': 'list', 'limits': CALIBRATION_MODES,
+             'value': 'manual',
+             'tip': 'reference/interferogram: the scaling is estimated from the FFT peak of the reference channel (at'
+                    ' the calibration wavelength) or of the interferogram (centered at the calibration wavelength).'
+                    ' It is only estimated again when the trace length changes or the fringe period drifts'},
+            {'title': 'Drift tolerance (%)', 'name': 'calibration_tolerance', 'type': 'float', 'value': 0.1,
+             'min': 0.},
+            {'title': 'Estimated Npts/Period', 'name': 'period_estimated', 'type': 'float', 'value': 0.,
+             'readonly': True},
+            {'title': 'Estimated Index/Delay scaling (fs)', 'name': 'scaling_estimated', 'type': 'float', 'value': 0.,
+             'readonly': True},
+        ]},
+        {'title': 'Resampling', 'name': 'resampling', 'type': 'group', 'children': [
+            {'title': 'Resample on reference', 'name': 'resample', 'type': 'bool', 'value': False,
+             'tip': 'Builds the delay axis from the zero crossings of the reference laser channel (of the calibration'
+                    ' wavelength) and resamples the trace on a uniform delay grid'},
+            {'title': 'Reference channel', 'name': 'reference_channel', 'type': 'list', 'limits': ['None'],
+             'value': 'None'},
+            {'title': 'Use stage position', 'name': 'use_position', 'type': 'bool', 'value': False,
+             'tip': 'Builds the delay axis from the stage position recorded by the detector during the sweep and'
+                    ' resamples the trace on a uniform delay grid (unless resampled on the reference)'},
+            {'title': 'Position/Delay scaling (fs)', 'name': 'position_scaling', 'type': 'float',
+             'value': 2 / (speed_of_light * 1e-6),
+             'tip': 'Delay per stage unit, default for a double pass delay line with positions in nm'},
+        ]},
+        {'title': 'ZPD', 'name': 'zpd', 'type': 'group', 'children': [
+            {'title': 'Method', 'name': 'zpd_method', 'type': 'list', 'limits': ZPD_METHODS, 'value': 'integer',
+             'tip': 'integer: sample of maximum modulus, parabolic: sub-sample maximum of the modulus, envelope:'
+                    ' sub-sample maximum of the Hilbert envelope. The traces are re-centered by a Fourier phase ramp'},
+        ]},
+        {'title': 'Co-addition', 'name': 'coaddition', 'type': 'group', 'children': [
+            {'title': 'Co-add sweeps', 'name': 'coadd', 'type': 'bool', 'value': False,
+             'tip': 'Aligns each new raw trace on the running average (cross-correlation) before accumulating it.'
+                    ' Not available when resampling on the reference or on the stage position'},
+            {'title': 'Max shift (pts)', 'name': 'max_shift', 'type': 'int', 'value': 0, 'min': 0,
+             'tip': 'Maximum alignment shift in samples, 0 for no limit'},
+            {'title': 'Co-added sweeps', 'name': 'count', 'type': 'int', 'value': 0, 'readonly': True},
+            {'title': 'Last shift (pts)', 'name': 'last_shift', 'type': 'float', 'value': 0., 'readonly': True},
+            {'title': 'Reset', 'name': 'reset', 'type': 'bool_push', 'value': False},
+        ]},
+        {'title': 'Frames', 'name': 'frames', 'type': 'group', 'children': [
+            {'title': 'Received', 'name': 'received', 'type': 'int', 'value': 0, 'readonly': True},
+            {'title': 'Processed', 'name': 'processed', 'type': 'int', 'value': 0, 'readonly': True},
+            {'title': 'Dropped', 'name': 'dropped', 'type': 'int', 'value': 0, 'readonly': True,
+             'tip': 'Frames replaced by a more recent one before being processed (folded into the average when'
+                    ' co-adding)'},
+            {'title': 'Reset counters', 'name': 'reset_counters', 'type': 'bool_push', 'value': False},
+        ]},
+        {'title': 'Apodization', 'name': 'apodization', 'type': 'group', 'children': [
+            {'title': 'Window', 'name': 'apodization', 'type': 'list', 'limits': APODIZATIONS,
+             'value': 'HyperGaussian'},
+            {'title': 'Order', 'name': 'apodization_order', 'type': 'int', 'value': 4, 'min': 1,
+             'tip': 'Order of the HyperGaussian window'},
+        ]},
+        {'title': 'FFT', 'name': 'fft', 'type': 'group', 'children': [
+            {'title': 'Mode', 'name': 'fft_mode', 'type': 'list', 'limits': FFT_MODES, 'value': 'complex',
+             'tip': 'complex: centered complex FFT, real: faster real input FFT with fast length padding'},
+            {'title': 'Threads', 'name': 'fft_workers', 'type': 'int', 'value': 0, 'min': 0,
+             'tip': 'Number of threads used by the real FFT, 0 for all the available cores'},
+            {'title': 'Phase correction', 'name': 'phase_correction', 'type': 'list', 'limits': PHASE_CORRECTIONS,
+             'value': 'none',
+             'tip': 'mertz: the scan can be one-sided (a short double-sided core around the ZPD and one long side),'
+                    ' the spectrum is phase corrected using the core. Always uses the real FFT'},
+            {'title': 'Core half width (fs)', 'name': 'core_width', 'type': 'float', 'value': 0., 'min': 0.,
+             'tip': 'Half width of the double-sided core used for the phase, 0 for all the points of the short side'},
+        ]},
+        {'title': 'Loading', 'name': 'loading', 'type': 'group', 'children': [
+            {'title': 'File', 'name': 'file', 'type': 'str', 'value': '', 'readonly': True},
+            {'title': 'Node', 'name': 'node', 'type': 'str', 'value': '', 'readonly': True},
+            {'title': 'Rows', 'name': 'n_rows', 'type': 'int', 'value': 0, 'readonly': True},
+            {'title': 'Row', 'name': 'row', 'type': 'int', 'value': 0, 'min': 0,
+             'tip': 'Index of the loaded trace to display and process'},
+            {'title': 'Batch start', 'name': 'batch_start', 'type': 'int', 'value': 0, 'min': 0},
+            {'title': 'Batch stop', 'name': 'batch_stop', 'type': 'int', 'value': 0, 'min': 0,
+             'tip': 'Index of the first row not processed'},
+            {'title': 'Chunk size', 'name': 'chunk_size', 'type': 'int', 'value': 64, 'min': 1,
+             'tip': 'Number of rows read and processed at once'},
+            {'title': 'Process batch', 'name': 'process_batch', 'type': 'bool_push', 'value': False,
+             'tip': 'Processes the rows of the batch range and displays their average spectrum'},
+        ]},
+        {'title': 'Saving', 'name': 'saving', 'type': 'group', 'children': [
+            {'title': 'Backend', 'name': 'backend', 'type': 'list', 'limits': H5_BACKENDS, 'value': H5_BACKENDS[0]},
+            {'title': 'Compression level', 'name': 'compression_level', 'type': 'int', 'value': 5, 'min': 0,
+             'max': 9},
+            {'title': 'Queue size', 'name': 'queue_size', 'type': 'int', 'value': 64, 'min': 1,
+             'tip': 'Maximum number of sweeps waiting to be written, further sweeps are dropped'},
+            {'title': 'File', 'name': 'file', 'type': 'str', 'value': '', 'readonly': True},
+            {'title': 'Saved sweeps', 'name': 'written', 'type': 'int', 'value': 0, 'readonly': True},
+            {'title': 'Dropped sweeps', 'name': 'dropped', 'type': 'int', 'value': 0, 'readonly': True},
+        ]},
+        {'title': 'Wavelength', 'name': 'wavelength_grid', 'type': 'group', 'children': [
+            {'title': 'Uniform grid', 'name': 'uniform_grid', 'type': 'bool', 'value': False,
+             'tip': 'Interpolates the spectrum onto a uniform wavelength grid instead of the frequency samples'},
+            {'title': 'Start (nm)', 'name': 'wl_start', 'type': 'float', 'value': 400., 'min': 1.},
+            {'title': 'Stop (nm)', 'name': 'wl_stop', 'type': 'float', 'value': 1000., 'min': 1.},
+            {'title': 'Npts', 'name': 'wl_npts', 'type': 'int', 'value': 1024, 'min': 2},
+        ]},
+        {'title': 'Display', 'name': 'display', 'type': 'group', 'children': [
+            {'title': 'Decimate', 'name': 'decimate', 'type': 'bool', 'value': True,
+             'tip': 'Displays the min/max envelope of the traces at screen resolution, recomputed on zoom'},
+        ]},
+        {'title': 'Timings (ms)', 'name': 'timings', 'type': 'group', 'expanded': False, 'children':
+            [{'title': stage.capitalize(), 'name': stage, 'type': 'float', 'value': 0., 'readonly': True}
+             for stage in STAGES] +
+            [{'title': 'Total', 'name': 'total', 'type': 'float', 'value': 0., 'readonly': True},
+             {'title': 'Rolling percentiles', 'name': 'instrument', 'type': 'bool', 'value': False,
+              'tip': 'Records the durations of the stages, of the displays and the latencies of the frames and shows'
+                     ' their rolling percentiles in the Timings dock'},
+             {'title': 'History', 'name': 'history', 'type': 'int', 'value': 500, 'min': 10,
+              'tip': 'Number of durations kept per timer'},
+             {'title': 'Log percentiles', 'name': 'log_timings', 'type': 'bool', 'value': False,
+              'tip': 'Also logs the median and 99th percentile of each timer every second'}]},
+    ]
 
     def __init__(self, dockarea, dashboard):
         super().__init__(dockarea, dashboard)
@@ -40,32 +165,121 @@ class FTIR(CustomApp):
         self.detector = self.modules_manager.get_mod_from_name('Autoco', mod='det')
         self.scan_window = None
 
+        self.instrumentation = RollingTimings(self.settings['timings', 'history'],
+                                              self.settings['timings', 'instrument'])
+        self._timings_timer = QtCore.QTimer()
+        self._timings_timer.setInterval(1000)
+        self._timings_timer.timeout.connect(self.refresh_timings)
+
         self.setup_ui()
 
         self._data = None
 
+        self.pipeline = FTIRPipeline(scaling=self.settings['calibration', 'scaling'],
+                                     calibration=self.settings['calibration', 'auto_calibration'],
+                                     calibration_tolerance=self.settings['calibration', 'calibration_tolerance'] / 100,
+                                     resample=self.settings['resampling', 'resample'],
+                                     reference_wavelength=self.settings['calibration', 'wavelength'],
+                                     use_position=self.settings['resampling', 'use_position'],
+                                     position_scaling=self.settings['resampling', 'position_scaling'],
+                                     zpd_method=self.settings['zpd', 'zpd_method'],
+                                     apodization=self.settings['apodization', 'apodization'],
+                                     apodization_order=self.settings['apodization', 'apodization_order'],
+                                     wavelength_grid=self.wavelength_grid(),
+                                     fft_mode=self.settings['fft', 'fft_mode'],
+                                     fft_workers=self.fft_workers(),
+                                     phase_correction=self.settings['fft', 'phase_correction'],
+                                     phase_core=self.phase_core())
+        self.processing = PipelineThread(self.pipeline)  # the pipeline is only modified by the processing thread
+        self.processing.result_ready.connect(self.show_processed_data)
+        self.result = None
+        self._streamed_raw = None
+        self._displayed_raw = None
+        self._processed_frames = 0
+
+        self.writer = None
+        self.loader = None
+
         self.y_data_raw = None
         self.x_data_raw = None
 
-        self._x_data = None
-        self._y_data = None
-        self._data_for_fft = None
-
-        self.spectral_density = None
-
         self._raw_data_init = False
         self._corrected_data_init = False
 
     def value_changed(self, param):
 
         if param.name() == 'wavelength' or param.name() == 'period':
-            self.settings.child('calibration',
-                                'scaling_computed').setValue(
-                self.settings['calibration', 'wavelength']/(speed_of_light*1e-9)/self.settings['calibration', 'period'])
+            self.settings.child('calibration', 'scaling_computed').setValue(
+                scaling_from_period(self.settings['calibration', 'wavelength'], self.settings['calibration', 'period']))
+
+        if param.name() == 'wavelength':
+            self.submit_job(reference_wavelength=param.value())
 
-        if param.name() == 'scaling':
+        if param.name() == 'auto_calibration':
+            self.submit_job(calibration=param.value())
+
+        if param.name() == 'reference_channel':
             if self._data is not None:
-                self.show_raw_data(self._data)
+                self.submit_job(data=self.frame_data(), new_frame=False)
+
+        if param.name() in ('resample', 'use_position') and param.value():
+            self.settings.child('coaddition', 'coadd').setValue(False)  # the sweeps are resampled independently
+
+        if param.name() == 'coadd' and param.value() and \
+                (self.settings['resampling', 'resample'] or self.settings['resampling', 'use_position']):
+            param.setValue(False)
+            logger.warning('Co-addition is not available when resampling the traces')
+
+        if param.name() in ('coadd', 'reset'):
+            self.reset_coaddition()
+
+        if param.name() == 'instrument':
+            self.instrumentation.enabled = param.value()
+            self.instrumentation.reset()
+            if param.value():
+                self._timings_timer.start()
+            else:
+                self._timings_timer.stop()
+                self.refresh_timings()
+
+        if param.name() == 'history':
+            self.instrumentation.history = param.value()
+
+        if param.name() == 'decimate':
+            for display in self.displays:
+                display.enabled = param.value()
+                display.refresh()
+
+        if param.name() == 'reset_counters':
+            self.processing.reset_counters()
+            self._processed_frames = 0
+            self.show_frame_counters()
+
+        if param.name() == 'row' and self.loader is not None:
+            self.show_row(param.value())
+
+        if param.name() == 'process_batch' and self.loader is not None:
+            self.process_rows(self.settings['loading', 'batch_start'], self.settings['loading', 'batch_stop'])
+
+        if param.name() == 'core_width':
+            self.submit_job(phase_core=self.phase_core())
+
+        if param.name() == 'max_shift':
+            self.submit_job(coaddition=dict(max_shift=param.value() if param.value() > 0 else None))
+
+        if param.name() == 'calibration_tolerance':  # in percent in the settings
+            self.submit_job(calibration_tolerance=param.value() / 100)
+        elif param.name() == 'fft_workers':
+            self.submit_job(fft_workers=self.fft_workers())
+        elif param.name() in STAGE_PARAMETERS:
+            self.submit_job(**{param.name(): param.value()})
+
+        if param.name() in ('uniform_grid', 'wl_start', 'wl_stop', 'wl_npts'):
+            self.submit_job(wavelength_grid=self.wavelength_grid())
+
+    def fft_workers(self):
+        """Number of threads of the real FFT, -1 for all the available cores"""
+        return self.settings['fft', 'fft_workers'] if self.settings['fft', 'fft_workers'] > 0 else -1
 
     def setup_docks(self):
         self.show_dashboard(False)
@@ -81,6 +295,11 @@ class FTIR(CustomApp):
         self.settings_dock.addWidget(self.settings_tree)
         self.dockarea.addDock(self.settings_dock)
 
+        self.timings_dock = Dock('Timings')
+        self.timings_table = TimingsTable()
+        self.timings_dock.addWidget(self.timings_table)
+        self.dockarea.addDock(self.timings_dock, 'bottom', self.settings_dock)
+
         raw_widget = QtWidgets.QWidget()
         self.raw_viewer = Viewer1D(raw_widget)
         self.raw_viewer.roi_manager.add_roi_programmatically()
@@ -104,13 +323,24 @@ class FTIR(CustomApp):
         self.spectrum_dock.addWidget(spectrum_widget)
         self.dockarea.addDock(self.spectrum_dock, 'bottom')
         self.spectrum_viewer.roi_manager.add_roi_programmatically()
-        self.spectrum_viewer.roi_manager.roi_changed.connect(self.update_spectrum_wl)
+        self.spectrum_viewer.roi_manager.roi_changed.connect(self.update_pipeline)
 
         spectrum_wl_widget = QtWidgets.QWidget()
         self.spectrum_wl_viewer = Viewer1D(spectrum_wl_widget)
         self.spectrum_wl_dock.addWidget(spectrum_wl_widget)
         self.dockarea.addDock(self.spectrum_wl_dock, 'right', self.spectrum_dock)
 
+        # the viewers only receive the envelope of the traces at screen resolution
+        decimate = self.settings['display', 'decimate']
+        self.raw_display = DecimatedViewer(self.raw_viewer, decimate, self.instrumentation, 'raw')
+        self.corrected_display = DecimatedViewer(self.corrected_viewer, decimate, self.instrumentation, 'correction')
+        self.filtered_display = DecimatedViewer(self.filtered_viewer, decimate, self.instrumentation, 'filtering')
+        self.spectrum_display = DecimatedViewer(self.spectrum_viewer, decimate, self.instrumentation, 'fft')
+        self.spectrum_wl_display = DecimatedViewer(self.spectrum_wl_viewer, decimate, self.instrumentation,
+                                                   'wavelength')
+        self.displays = [self.raw_display, self.corrected_display, self.filtered_display, self.spectrum_display,
+                         self.spectrum_wl_display]
+
     @QtCore.Slot(OrderedDict)
     def show_raw_data(self, data):
         """
@@ -119,100 +349,174 @@ class FTIR(CustomApp):
         ----------
         data: (OrderedDict) #OrderedDict(name=self.title,x_axis=None,y_axis=None,z_axis=None,data0D=None,data1D=None,data2D=None)
         """
+        if self.instrumentation.enabled and 'acq_time_s' in data:  # time stamped by the DAQ_Viewer on reception
+            self.instrumentation.add('detector to slot', time.time() - data['acq_time_s'])
         self._data = data
         self.y_data_raw = data['data1D']['Autoco_Amplified difference_CH000']['data']
         self.x_data_raw = data['data1D']['Autoco_Amplified difference_CH000']['x_axis']
+        self.submit_job(data=self.frame_data())
 
-        self.raw_viewer.show_data([self.y_data_raw.copy()], x_axis=self.x_data_raw,
-                                  labels=['Raw data'])
+    def frame_data(self):
+        """The arguments of FTIRPipeline.set_data for the last received frame"""
+        return dict(y_raw=self.y_data_raw, x_raw=self.x_data_raw['data'], reference=self.get_reference(self._data),
+                    position=self.get_position(self._data), scaling=self._data.get('delay_scaling'),
+                    direction=self._data['data1D']['Autoco_Amplified difference_CH000'].get('direction'))
 
-        self.x_data_raw *= self.settings['calibration', 'scaling']
-        self.x_data_raw['units'] = 'fs'
-        self.x_data_raw['label'] = 'Delay'
+    def show_raw(self, y_raw):
+        """Displays the raw trace (or co-added average) processed by the pipeline"""
+        x_axis = self.x_data_raw
+        if len(x_axis['data']) != len(y_raw):  # the frame length changed while processing
+            x_axis = utils.Axis(data=mutils.linspace_step(0, len(y_raw) - 1, 1), label='time steps')
+        self.raw_display.show_data([y_raw], x_axis=x_axis, labels=['Raw data'])
 
         if not self._raw_data_init:
-            x1 = self.x_data_raw['data'][0] + (self.x_data_raw['data'][-1] - self.x_data_raw['data'][0]) / 4
-            x2 = self.x_data_raw['data'][0] + 3 * (self.x_data_raw['data'][-1] - self.x_data_raw['data'][0]) / 4
-            self.raw_viewer.roi_manager.get_roi_from_index(0).setPos((x1, x2))
+            if self.one_sided():  # the ZPD is close to one end of the trace
+                self.raw_viewer.roi_manager.get_roi_from_index(0).setPos((x_axis['data'][0], x_axis['data'][-1]))
+            else:
+                self.raw_viewer.roi_manager.get_roi_from_index(0).setPos(self.pipeline.central_half(x_axis['data']))
             self._raw_data_init = True
-            self.raw_viewer.roi_manager.ROI_changed_finished.connect(self.update_corrected_data)
-        self.update_corrected_data()
-
-    def update_corrected_data(self):
-        pos = [val * self.settings['calibration', 'scaling'] for val in
-               self.raw_viewer.roi_manager.get_roi_from_index(0).getRegion()]
-
-        index = mutils.find_index(self.x_data_raw['data'], pos)
-        data_for_max = self.y_data_raw[index[0][0]:index[1][0]]
-        try:
-            y_index_data_max = np.argmax(np.abs(data_for_max)) + index[0][0]
-
-            dx = index[1][0] - index[0][0]
-
-            x_data_selected = self.x_data_raw['data'][y_index_data_max-int(dx/2):y_index_data_max+int(dx/2)]
-            y_data_selected = self.y_data_raw[y_index_data_max-int(dx/2):y_index_data_max+int(dx/2)]
-
-            self._x_data = x_data_selected - np.mean(x_data_selected)
-            y_data_selected = y_data_selected - np.mean(y_data_selected)
-
-            self._y_data = y_data_selected / np.max(np.abs(y_data_selected))
-
-            self.corrected_viewer.show_data([self._y_data], x_axis=utils.Axis(data=self._x_data,
-                                                                              units=self.x_data_raw['units'],
-                                                                              label=self.x_data_raw['label']),
-                                            labels=['Corrected/Normalized data'])
+            self.raw_viewer.roi_manager.ROI_changed_finished.connect(self.update_pipeline)
+
+    def reset_coaddition(self):
+        self.submit_job(coaddition=dict(enabled=self.settings['coaddition', 'coadd'], reset=True))
+        self.settings.child('coaddition', 'count').setValue(0)
+        self.settings.child('coaddition', 'last_shift').setValue(0.)
+
+    def show_frame_counters(self):
+        self.settings.child('frames', 'received').setValue(self.processing.received)
+        self.settings.child('frames', 'processed').setValue(self._processed_frames)
+        self.settings.child('frames', 'dropped').setValue(self.processing.dropped)
+
+    def get_reference(self, data):
+        """Returns the reference laser trace from the detector data if one has been selected, None otherwise"""
+        channels = ['None'] + [key for key in data['data1D'] if key not in ('Autoco_Amplified difference_CH000',
+                                                                             'Autoco_Stage position_CH000')]
+        if channels != self.settings.child('resampling', 'reference_channel').opts['limits']:
+            self.settings.child('resampling', 'reference_channel').setLimits(channels)
+        if self.settings['resampling', 'reference_channel'] in channels[1:]:
+            return data['data1D'][self.settings['resampling', 'reference_channel']]['data']
+
+    def get_position(self, data):
+        """Returns the stage position trace recorded by the detector during the sweep, None if not recorded"""
+        if 'Autoco_Stage position_CH000' in data['data1D']:
+            return data['data1D']['Autoco_Stage position_CH000']['data']
+
+    def phase_core(self):
+        """Half width (fs) of the double-sided core of the phase correction, None for all the short side"""
+        return self.settings['fft', 'core_width'] if self.settings['fft', 'core_width'] > 0 else None
+
+    def one_sided(self):
+        return self.settings['fft', 'phase_correction'] != 'none'
+
+    def wavelength_grid(self):
+        """Returns the (start, stop, npts) uniform wavelength grid from the settings, None if not enabled"""
+        if self.settings['wavelength_grid', 'uniform_grid']:
+            return (self.settings['wavelength_grid', 'wl_start'], self.settings['wavelength_grid', 'wl_stop'],
+                    self.settings['wavelength_grid', 'wl_npts'])
+
+    def delay_scaling(self):
+        """The Index/Delay scaling (fs) of the last processed trace, from the settings if not auto calibrated"""
+        if self.result is not None and self.result.scaling is not None and \
+                self.settings['calibration', 'auto_calibration'] != 'manual':
+            return self.result.scaling
+        return self.settings['calibration', 'scaling']
+
+    def show_calibration(self, scaling):
+        # period = wavelength / c / scaling as well, hence the same function
+        self.settings.child('calibration', 'scaling_estimated').setValue(scaling)
+        self.settings.child('calibration', 'period_estimated').setValue(
+            scaling_from_period(self.settings['calibration', 'wavelength'], scaling))
+
+    def read_rois(self):
+        """Returns the ROI positions as pipeline parameters, only the changed ones will invalidate its stages"""
+        parameters = dict(spectral_roi=self.spectrum_viewer.roi_manager.get_roi_from_index(0).getRegion())
+        if self._raw_data_init:
+            region = self.raw_viewer.roi_manager.get_roi_from_index(0).getRegion()
+            if self.result is not None and self.result.sample_delay is not None:  # same axis as x_delay
+                parameters['zpd_window'] = [float(val) for val in self.pipeline.raw_to_delay(self.result, region)]
+            else:
+                parameters['zpd_window'] = [val * self.delay_scaling() for val in region]
+        if self._corrected_data_init:
+            parameters['apodization_window'] = self.corrected_viewer.roi_manager.get_roi_from_index(0).getRegion()
+        return parameters
+
+    def update_pipeline(self):
+        """Recomputes the processing stages affected by a ROI move"""
+        self.submit_job()
+
+    def submit_job(self, data=None, new_frame=True, coaddition=None, **parameters):
+        """Sends the trace (if any), the given pipeline parameters and the ROI positions to the processing thread
+
+        The stages affected by the changes are recomputed there and show_processed_data is called with the result.
+        Frames submitted while the processing thread is busy are coalesced, only the latest one being processed (see
+        worker.PipelineThread)
+        """
+        parameters.update(self.read_rois())
+        self.processing.submit(ProcessingJob(parameters, data, new_frame, process=self._data is not None,
+                                             coaddition=coaddition))
+
+    @QtCore.Slot(object, list, dict, dict)
+    def show_processed_data(self, result, stages, timings, frames):
+        """Refreshes the viewers of the recomputed stages with the result sent back by the processing thread"""
+        self.result = result
+        self.show_timings(timings)
+        if self.instrumentation.enabled:
+            if frames['submitted'] is not None:
+                self.instrumentation.add('slot to result', time.perf_counter() - frames['submitted'])
+            for stage, duration in timings.items():
+                self.instrumentation.add(stage, duration)
+        self._processed_frames += frames['frames']
+        self.show_frame_counters()
+        self.settings.child('coaddition', 'count').setValue(frames['coadded'])
+        self.settings.child('coaddition', 'last_shift').setValue(frames['last_shift'])
+
+        if 'delay' in stages and result.scaling is not None and \
+                self.settings['calibration', 'auto_calibration'] != 'manual':
+            self.show_calibration(result.scaling)
+
+        if result.y_raw is not self._displayed_raw:
+            self._displayed_raw = result.y_raw
+            self.show_raw(result.y_raw)
+
+        if 'correction' in stages:
+            self.corrected_display.show_data([result.y_corrected],
+                                             x_axis=utils.Axis(data=result.x_corrected, units='fs', label='Delay'),
+                                             labels=['Corrected/Normalized data'])
             if not self._corrected_data_init:
-                x1 = self._x_data[0] + (self._x_data[-1] - self._x_data[0]) / 4
-                x2 = self._x_data[0] + 3 * (self._x_data[-1] - self._x_data[0]) / 4
-                self.corrected_viewer.roi_manager.get_roi_from_index(0).setPos((x1, x2))
+                self.corrected_viewer.roi_manager.get_roi_from_index(0).setPos(
+                    self.pipeline.symmetric_extent(result.x_corrected) if self.one_sided() else
+                    self.pipeline.central_half(result.x_corrected))
                 self._corrected_data_init = True
-                self.corrected_viewer.roi_manager.ROI_changed_finished.connect(self.update_filtered_data)
+                self.corrected_viewer.roi_manager.ROI_changed_finished.connect(self.update_pipeline)
 
-            self.update_filtered_data()
+        if 'filtering' in stages:
+            self.filtered_display.show_data([result.y_filtered, result.window],
+                                            x_axis=utils.Axis(data=result.x_corrected, units='fs', label='Delay'),
+                                            labels=['data before FFT',
+                                                    f'{self.settings["apodization", "apodization"]} filter'])
 
-        except Exception as e:
-            pass
+        if 'fft' in stages:
+            self.spectrum_display.show_data([result.spectrum], x_axis=utils.Axis(data=result.omega,
+                                                                                 units='rad/fs',
+                                                                                 label='radial frequency'))
 
-    def update_filtered_data(self):
-        pos = self.corrected_viewer.roi_manager.get_roi_from_index(0).getRegion()
-        gaussian_filter = mutils.gauss1D(self._x_data, np.mean(pos), np.diff(pos)[0], 4)
-        try:
-            self._data_for_fft = self._y_data * gaussian_filter
-            self.filtered_viewer.show_data([self._data_for_fft, gaussian_filter],
-                                           x_axis=utils.Axis(data=self._x_data,
-                                                             units=self.x_data_raw['units'],
-                                                             label=self.x_data_raw['label']),
-                                           labels=['data before FFT', 'HyperGaussian filter'])
-
-            self.update_fft()
-        except Exception as e:
-            pass
-
-    def update_fft(self):
-        self.omega_grid, time_grid = mutils.ftAxis_time(len(self._x_data), max(self._x_data) - min(self._x_data))
-        self.spectral_density = np.abs(mutils.ift(self._data_for_fft))
-
-        self.spectrum_viewer.show_data([self.spectral_density], x_axis=utils.Axis(data=self.omega_grid,
-                                                                                  units='rad/fs',
-                                                                                  label='radial frequency'))
-
-        self.update_spectrum_wl()
-
-    def update_spectrum_wl(self):
-        pos = list(self.spectrum_viewer.roi_manager.get_roi_from_index(0).getRegion())
-        pos[0] = max((pos[0], 0.4))
-        try:
-            index = mutils.find_index(self.omega_grid, pos)
-            omega_clipped = self.omega_grid[index[0][0]: index[1][0]]
-            spectrum_clipped = self.spectral_density[index[0][0]: index[1][0]]
+        if 'wavelength' in stages:
+            self.wavelength_axis = utils.Axis(data=result.wavelength, label='Wavelength', units='nm')
+            self.spectrum_wl_display.show_data([result.spectrum_wl], x_axis=self.wavelength_axis)
 
-            self.wavelength_axis = utils.Axis(data=utils.l2w(omega_clipped)[::-1], label='Wavelength', units='nm')
-            self.spectral_wl_density = mutils.normalize(spectrum_clipped[::-1] / self.wavelength_axis['data']**2)
+        if self.writer is not None and 'fft' in stages and result.y_raw is not self._streamed_raw:
+            self.stream_result(result)
 
-            self.spectrum_wl_viewer.show_data([self.spectral_wl_density], x_axis=self.wavelength_axis)
+    def show_timings(self, timings):
+        for stage in STAGES:
+            self.settings.child('timings', stage).setValue(timings.get(stage, 0.) * 1000)
+        self.settings.child('timings', 'total').setValue(sum(timings.values()) * 1000)
 
-        except Exception as e:
-            pass
+    def refresh_timings(self):
+        """Shows (and logs) the rolling percentiles of the timers, called every second when instrumented"""
+        self.timings_table.show_percentiles(self.instrumentation.percentiles())
+        if self.settings['timings', 'log_timings']:
+            logger.info(f'Timings p50/p99 (ms): {self.instrumentation.summary()}')
 
     def setup_actions(self):
         self.add_action('quit', 'Quit', 'close2', "Quit program")
@@ -223,7 +527,8 @@ class FTIR(CustomApp):
         self.add_action('config', 'Show Config', 'gear2', 'Open and change configuration', checkable=False)
 
         self.toolbar.addSeparator()
-        self.add_action('save_data', 'Save Data', 'SaveAs', "Save current data", checkable=False)
+        self.add_action('save_data', 'Save Data', 'SaveAs', "Stream the current and next sweeps to a h5 file",
+                        checkable=True)
         self.add_action('load_data', 'Load Data', 'Open', "Load external data", checkable=False)
 
         self.toolbar.addSeparator()
@@ -258,19 +563,117 @@ class FTIR(CustomApp):
     def load_layout(self):
         pymodaq.utils.gui_utils.layout.load_layout_state(self.dockarea)
 
-    def save_data(self):
-        #TODO
-        pass
+    def save_data(self, save=True):
+        """Starts (or stops) streaming the processed sweeps into a new h5 file"""
+        if self.writer is not None:
+            self.writer.close()
+            self.update_saving_status()
+            self.writer = None
+        if not save:
+            return
+        file_path = select_file(save=True, ext='h5')
+        if file_path is None or str(file_path) in ('', '.'):
+            self.set_action_checked('save_data', False)
+            return
+        self.writer = FTIRWriter(self.settings['saving', 'backend'], self.settings['saving', 'compression_level'],
+                                 self.settings['saving', 'queue_size'])
+        try:
+            self.writer.open(file_path)
+        except IOError as e:
+            logger.warning(str(e))
+            self.writer = None
+            self.set_action_checked('save_data', False)
+            return
+        self.settings.child('saving', 'file').setValue(str(file_path))
+        if self.result is not None and self.result.spectrum is not None:
+            self.stream_result(self.result)
+
+    def stream_result(self, result):
+        """Queues the raw trace, delay axis, filtered trace and spectrum of a processing result for writing"""
+        self._streamed_raw = result.y_raw
+        self.writer.write(raw=result.y_delay, delay=result.x_delay, filtered=result.y_filtered,
+                          delay_corrected=result.x_corrected, spectrum=result.spectrum, omega=result.omega)
+        self.update_saving_status()
+
+    def update_saving_status(self):
+        self.settings.child('saving', 'written').setValue(self.writer.written)
+        self.settings.child('saving', 'dropped').setValue(self.writer.dropped)
 
     def load_data(self):
-        data, fname, node_path = browse_data(ret_all=True)
-        data_dict = OrderedDict(data1D=OrderedDict(Autoco_AutocoTrace_CH000=OrderedDict(data=data[0, :])))
-        data_dict['data1D']['Autoco_AutocoTrace_CH000']['x_axis'] = \
-            utils.Axis(data=mutils.linspace_step(0, len(data[0, :])-1, 1),
-                       label='time steps')
-
+        """Opens lazily the interferograms of a h5 node and displays its first row"""
+        file_path = select_file(save=False, ext='h5')
+        if file_path is None or str(file_path) in ('', '.'):
+            return
+        node_path = select_node(str(file_path), self.settings['saving', 'backend'])
+        if node_path is None:
+            return
+        if self.loader is not None:
+            self.loader.close()
+        self.loader = LazyInterferograms(str(file_path), node_path, self.settings['saving', 'backend'])
+
+        self.settings.child('loading', 'file').setValue(str(file_path))
+        self.settings.child('loading', 'node').setValue(node_path)
+        self.settings.child('loading', 'n_rows').setValue(self.loader.n_rows)
+        for name in ['row', 'batch_start', 'batch_stop']:
+            self.settings.child('loading', name).setLimits((0, self.loader.n_rows))
+        self.settings.child('loading', 'batch_stop').setValue(self.loader.n_rows)
+        if self.settings['loading', 'row'] != 0:
+            self.settings.child('loading', 'row').setValue(0)  # triggers show_row
+        else:
+            self.show_row(0)
+
+    def loaded_axis(self, row, stop=None):
+        """The acquisition axis (index units) of the loaded row(s), the stored delay divided by its own step if any"""
+        delay = self.loader.delay(row, stop)
+        scaling = self.loader.delay_step(row)
+        if scaling is None:
+            return mutils.linspace_step(0, self.loader.n_points - 1, 1)
+        return (delay if stop is None else delay[0]) / scaling
+
+    def show_row(self, row):
+        """Displays and processes a single row of the loaded interferograms"""
+        row = min(row, self.loader.n_rows - 1)
+        data_dict = OrderedDict(data1D=OrderedDict(
+            [('Autoco_Amplified difference_CH000', OrderedDict(data=self.loader.rows(row)))]))
+        data_dict['data1D']['Autoco_Amplified difference_CH000']['x_axis'] = \
+            utils.Axis(data=self.loaded_axis(row), label='time steps')
+        data_dict['delay_scaling'] = self.loader.delay_step(row)
         self.show_raw_data(data_dict)
 
+    def process_rows(self, start, stop):
+        """Streams the loaded rows start to stop (excluded) by chunks through the pipeline, saving them if a file is
+        being written, and displays their average spectrum"""
+        # own calibrator and result, the live pipeline is modified by the processing thread
+        pipeline = FTIRPipeline(**self.pipeline.parameters())
+        spectrum_sum = None
+        count = 0
+        for chunk_start, rows in self.loader.iter_chunks(start, stop, self.settings['loading', 'chunk_size']):
+            try:
+                result = pipeline.process_batch(rows, self.loaded_axis(chunk_start, chunk_start + len(rows)),
+                                                scaling=self.loader.delay_step(chunk_start))
+            except Exception as e:
+                logger.warning(f'Could not process the rows {chunk_start} to {chunk_start + len(rows)}: {str(e)}')
+                continue
+            spectrum_sum = np.sum(result.spectrum, axis=0) + (spectrum_sum if spectrum_sum is not None else 0)
+            count += len(rows)
+            if self.writer is not None:
+                for ind in range(len(rows)):
+                    self.writer.write(block=True, raw=result.y_delay[ind], delay=result.x_delay,
+                                      filtered=result.y_filtered[ind], delay_corrected=result.x_corrected,
+                                      spectrum=result.spectrum[ind], omega=result.omega)
+                self.update_saving_status()
+            QtWidgets.QApplication.processEvents()
+        if count == 0:
+            return
+
+        spectrum = spectrum_sum / count
+        self.spectrum_display.show_data([spectrum], x_axis=utils.Axis(data=result.omega, units='rad/fs',
+                                                                      label='radial frequency'),
+                                        labels=[f'Average of {count} rows'])
+        wavelength, spectrum_wl = pipeline.to_wavelength(result.omega, spectrum)
+        self.spectrum_wl_display.show_data([spectrum_wl], x_axis=utils.Axis(data=wavelength, label='Wavelength',
+                                                                            units='nm'))
+
     def show_dashboard(self, show=True):
         self.dashboard.mainwindow.setVisible(show)
 
@@ -285,6 +688,11 @@ class FTIR(CustomApp):
             self.detector.grab()
 
     def quit_function(self):
+        self.processing.quit()
+        if self.writer is not None:
+            self.writer.close()
+        if self.loader is not None:
+            self.loader.close()
         self.dockarea.parent().close()
 
 
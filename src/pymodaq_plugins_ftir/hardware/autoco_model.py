@@ -0,0 +1,29 @@
+"""
+Signal model of the simulated autocorrelator: a (hyper) Gaussian envelope times a cosine at the optical frequency.
+
+It is shared by the DAQ_1DViewer_AutocoMock plugin and the benchmarks so that both generate the same traces.
+"""
+import numpy as np
+
+from pymodaq.utils.math_utils import gauss1D
+from pymodaq.utils.units import l2w
+
+
+def autoco_trace(x, amp=1., dx=5., n=1, wavelength=595., scaling=0.09186):
+    """Noiseless interferogram centered on the middle of the acquisition axis
+
+    Parameters
+    ----------
+    x: (ndarray) the acquisition axis in index units
+    amp: (float) amplitude of the trace
+    dx: (float) FWHM of the envelope in fs
+    n: (int) order of the hyper Gaussian envelope
+    wavelength: (float) central wavelength in nm
+    scaling: (float) Index/Delay scaling in fs
+
+    Returns
+    -------
+    ndarray: the trace, same shape as x
+    """
+    x = np.asarray(x)
+    return amp * gauss1D(x, np.mean(x), dx / scaling, n) * np.cos(x * scaling * l2w(wavelength))
@@ -0,0 +1,97 @@
+"""
+Background recording of the delay stage position during a sweep.
+
+The stage is read from a daemon thread at a fixed rate, independently of the DAQmx callbacks, and each reading is
+time stamped with time.perf_counter (middle of the read call). The position of the stage at any other instant, for
+instance at the DAQ sample clock ticks, is then obtained by linear interpolation.
+"""
+import threading
+import time
+
+import numpy as np
+
+from pymodaq.utils.logger import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+
+class PositionSampler:
+    """Samples a position reading function at a given rate in a background thread
+
+    Parameters
+    ----------
+    read_position: (callable) returns the current position of the stage
+    rate: (float) sampling rate in Hz
+    capacity: (int) initial number of readings that can be stored, doubled when exceeded
+    """
+
+    def __init__(self, read_position, rate=200., capacity=1024):
+        self.read_position = read_position
+        self.rate = rate
+        self._times = np.zeros((capacity,))
+        self._positions = np.zeros((capacity,))
+        self.count = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def times(self):
+        """perf_counter time stamps of the readings of the last recording"""
+        return self._times[:self.count]
+
+    @property
+    def positions(self):
+        """positions read during the last recording"""
+        return self._positions[:self.count]
+
+    def start(self):
+        """Starts a new recording, the readings of the previous one are discarded"""
+        self.stop()
+        self.count = 0
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='PositionSampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the recording and waits for the sampling thread to finish"""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def _store(self, time_stamp, position):
+        if self.count == len(self._times):
+            self._times = np.concatenate((self._times, np.zeros_like(self._times)))
+            self._positions = np.concatenate((self._positions, np.zeros_like(self._positions)))
+        self._times[self.count] = time_stamp
+        self._positions[self.count] = position
+        self.count += 1
+
+    def _run(self):
+        period = 1 / self.rate
+        next_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            before = time.perf_counter()
+            try:
+                position = self.read_position()
+            except Exception as e:
+                logger.warning(f'Stage position sampling stopped: {str(e)}')
+                break
+            self._store((before + time.perf_counter()) / 2, position)
+            next_time += period
+            self._stop_event.wait(max(0., next_time - time.perf_counter()))
+
+    def positions_at(self, times):
+        """Stage positions at the given perf_counter times, linearly interpolated between the recorded readings
+
+        Raises
+        ------
+        ValueError: if less than two readings have been recorded
+        """
+        if self.count < 2:
+            raise ValueError('At least two stage positions should have been recorded')
+        return np.interp(times, self.times, self.positions)
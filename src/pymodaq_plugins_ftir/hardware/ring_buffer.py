@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Preallocated multi-channel ring buffer of acquisition blocks
+
+    Each block is a (n_channels, n_samples) array as read from the DAQ in one callback. The storage is allocated once
+    and the blocks are written in place. The last n blocks are returned as a numpy view as long as they do not wrap
+    around the end of the storage.
+
+    The sum of the last window blocks is kept up to date when a block is committed (the new block is added and the one
+    leaving the window subtracted), so that their average costs a single division whatever the window. When the
+    averages are taken over consecutive, non-overlapping windows, clear_sum after each of them avoids the subtractions.
+
+    Parameters
+    ----------
+    n_channels: (int) number of acquired channels
+    n_samples: (int) number of samples per channel in a block
+    depth: (int) number of blocks kept in the history, at least window
+    window: (int) number of blocks of the running sum
+    dtype: numpy dtype of the stored data
+    """
+
+    def __init__(self, n_channels, n_samples, depth=1, window=1, dtype=np.float64):
+        if window < 1:
+            raise ValueError('The window of the ring buffer should be at least 1')
+        if depth < window:
+            raise ValueError(f'The depth of the ring buffer should be at least its window ({window})')
+        self.depth = depth
+        self.window = window
+        self._buffer = np.zeros((depth, n_channels, n_samples), dtype=dtype)
+        self._index = 0
+        self.count = 0  # total number of blocks written since the last reset
+        self._evicted = False
+        self._summed = 0  # number of blocks in the running sum
+        self._sum = np.zeros((n_channels, n_samples), dtype=dtype)
+        self._average = np.zeros((n_channels, n_samples), dtype=dtype)
+        self._scratch = np.zeros((n_channels, n_samples), dtype=dtype)
+
+    @property
+    def shape(self):
+        """Shape of a block: (n_channels, n_samples)"""
+        return self._buffer.shape[1:]
+
+    def reset(self):
+        self._index = 0
+        self.count = 0
+        self.clear_sum()
+
+    def clear_sum(self):
+        """Empties the running sum, the blocks are kept in the history"""
+        self._evicted = False
+        self._summed = 0
+        self._sum[:] = 0
+
+    def _evict(self):
+        """Removes from the running sum the block leaving the window, before it may be overwritten"""
+        if not self._evicted and self._summed == self.window:
+            self._sum -= self._buffer[(self._index - self.window) % self.depth]
+            self._summed -= 1
+        self._evicted = True
+
+    def next_block(self):
+        """View on the block to be written next, a DAQ read can fill it in place before calling commit"""
+        self._evict()
+        return self._buffer[self._index]
+
+    def commit(self):
+        """Validates the block filled through next_block"""
+        self._evict()
+        self._sum += self._buffer[self._index]
+        self._summed += 1
+        self._evicted = False
+        self._index = (self._index + 1) % self.depth
+        self.count += 1
+
+    def write(self, data):
+        """Copies data (any array with n_channels * n_samples elements, channel major) into the next block"""
+        np.copyto(self.next_block(), np.reshape(data, self.shape))
+        self.commit()
+
+    def _segments(self, n):
+        if n < 1 or n > min(self.depth, self.count):
+            raise ValueError(f'Only {min(self.depth, self.count)} blocks are available')
+        stop = self._index if self._index > 0 else self.depth
+        if stop >= n:
+            return [self._buffer[stop - n:stop]]
+        return [self._buffer[stop - n:], self._buffer[:stop]]
+
+    def last(self, n=1):
+        """The last n written blocks, oldest first, as a (n, n_channels, n_samples) array
+
+        This is a view on the storage unless the blocks wrap around its end, in which case they are copied.
+        """
+        segments = self._segments(n)
+        return segments[0] if len(segments) == 1 else np.concatenate(segments)
+
+    def latest(self):
+        """View on the last written block"""
+        return self.last(1)[0]
+
+    def decimated(self, step, n=1):
+        """The last n blocks keeping one sample every step (a view if the blocks do not wrap)"""
+        return self.last(n)[..., ::step]
+
+    def mean(self, n=1):
+        """Average of the last n blocks
+
+        The result is written into an internal preallocated array which is overwritten at each call. It is taken from
+        the running sum if n is the window, otherwise the blocks are summed (wrapping blocks are handled without copy).
+        """
+        if n == self.window and self._summed == n:
+            return np.divide(self._sum, n, out=self._average)
+        segments = self._segments(n)
+        np.sum(segments[0], axis=0, out=self._average)
+        if len(segments) == 2:
+            self._average += np.sum(segments[1], axis=0, out=self._scratch)
+        self._average /= n
+        return self._average
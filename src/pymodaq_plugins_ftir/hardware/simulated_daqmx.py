@@ -0,0 +1,199 @@
+"""
+Software stand-in of the pymodaq_plugins_daqmx DAQmx controller used by the Diodes and Autoco plugins.
+
+It does not depend on PyDAQmx or on NI hardware and returns synthetic multi-channel data, so that the acquisition
+path of the plugins can be exercised and benchmarked on any computer. Once a task with a registered callback is
+started, a clock thread calls the callback every Nsamples / frequency seconds on a fixed schedule, as the DAQmx
+driver does when the hardware clock has acquired a block. If the callback takes longer than a block, the next ones
+are fired back to back, as if the samples were waiting in the driver buffer, and the late callbacks are counted.
+The delay between the scheduled tick and each callback call is recorded to measure the latency of the plugins.
+"""
+import collections
+import threading
+import time
+
+import numpy as np
+
+DAQmx_Val_GroupByChannel = 0  # same value as the PyDAQmx constant
+LATENCY_HISTORY = 10000  # number of callback latencies kept
+
+
+class ClockSettings:
+    """Stand-in of the pymodaq_plugins_daqmx ClockSettings, only the attributes used by the simulation"""
+
+    def __init__(self, frequency=1000, Nsamples=1000, repetition=False, **kwargs):
+        self.frequency = frequency
+        self.Nsamples = Nsamples
+        self.repetition = repetition
+
+
+class AIChannel:
+    """Stand-in of the pymodaq_plugins_daqmx AIChannel"""
+
+    def __init__(self, name='', source='Analog_Input', analog_type='Voltage', value_min=-10., value_max=10.,
+                 termination='Diff', **kwargs):
+        self.name = name
+        self.source = source
+        self.analog_type = analog_type
+        self.value_min = value_min
+        self.value_max = value_max
+        self.termination = termination
+
+
+class SimulatedTask:
+    """Mimics the subset of the PyDAQmx.Task methods used by the plugins"""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self.running = False
+        self._thread = None
+        self._stop_event = None
+
+    def StartTask(self):
+        self.StopTask()
+        self.running = True
+        if self._controller.c_callback is not None:
+            self._stop_event = threading.Event()  # one per run, the previous clock thread may still be finishing
+            self._thread = threading.Thread(target=self._run_clock, args=(self._stop_event,),
+                                            name='SimulatedDAQmxClock', daemon=True)
+            self._thread.start()
+
+    def StopTask(self):
+        """Stops the clock, can be called from within the callback"""
+        self.running = False
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _run_clock(self, stop_event):
+        controller = self._controller
+        clock_settings = controller.clock_settings
+        n_samples = controller.callback_nsamples if controller.callback_event == 'Nsamples' else \
+            clock_settings.Nsamples
+        period = n_samples / clock_settings.frequency
+        tick = time.perf_counter() + period
+        while not stop_event.wait(max(tick - time.perf_counter(), 0.)):
+            now = time.perf_counter()
+            controller.latencies.append(now - tick)
+            if now - tick > period:
+                controller.late_callbacks += 1
+            if controller.callback_event == 'Nsamples':
+                controller.c_callback(None, 0, n_samples, None)
+            else:
+                controller.c_callback(None, 0)
+            controller.callbacks += 1
+            if not clock_settings.repetition:  # finite acquisition of a single block
+                self.running = False
+                break
+            tick += period
+
+    def ReadAnalogF64(self, numSampsPerChan, timeout, fillMode, readArray, arraySizeInSamps, sampsPerChanRead,
+                      reserved):
+        """Fills readArray in place, channel major (DAQmx_Val_GroupByChannel), with numSampsPerChan samples per
+        channel. sampsPerChanRead should be a ctypes pointer to an int32"""
+        n_channels = arraySizeInSamps // numSampsPerChan
+        self._controller.fill(np.reshape(readArray, (n_channels, numSampsPerChan)))
+        sampsPerChanRead.contents.value = numSampsPerChan
+        return 0
+
+
+class SimulatedDAQmx:
+    """Simulated DAQmx controller generating a noisy sine per channel
+
+    Parameters
+    ----------
+    signal_frequency: (float) frequency in Hz of the simulated signals
+    noise: (float) amplitude of the additive noise
+
+    Attributes
+    ----------
+    callbacks: (int) number of callbacks fired since the last update_task
+    late_callbacks: (int) number of callbacks fired more than one block after their scheduled tick
+    latencies: (deque) delays in seconds between the scheduled ticks and the callback calls, most recent last
+    """
+
+    devices = ['Dev1']  # names of the simulated devices, each with 8 analog inputs
+
+    def __init__(self, signal_frequency=50., noise=0.01):
+        self.signal_frequency = signal_frequency
+        self.noise = noise
+        self.channels = []
+        self.clock_settings = None
+        self.c_callback = None
+        self.callback_event = 'done'
+        self.callback_nsamples = 1
+        self.callbacks = 0
+        self.late_callbacks = 0
+        self.latencies = collections.deque(maxlen=LATENCY_HISTORY)
+        self._task = None
+        self._template = None
+        self._offset = 0
+
+    @classmethod
+    def get_NIDAQ_channels(cls, devices=None, source_type='Analog_Input'):
+        """Names of the simulated channels, only analog inputs are simulated"""
+        if source_type != 'Analog_Input':
+            return []
+        return [f'{device}/ai{ind}' for device in (cls.devices if devices is None else devices) for ind in range(8)]
+
+    @property
+    def task(self):
+        return self._task
+
+    def update_task(self, channels=[], clock_settings=None, trigger_settings=None):
+        if self._task is not None:
+            self._task.StopTask()
+        self.channels = channels
+        self.clock_settings = clock_settings
+        self._task = SimulatedTask(self)
+        self.c_callback = None
+        self.callbacks = 0
+        self.late_callbacks = 0
+        self.latencies.clear()
+        self._make_template()
+
+    def _make_template(self):
+        """Precomputes two periods of acquisition so that any block of Nsamples is a slice of the template"""
+        n_samples = self.clock_settings.Nsamples
+        time = np.arange(2 * n_samples) / self.clock_settings.frequency
+        phases = np.linspace(0, np.pi, len(self.channels), endpoint=False)[:, None]
+        rng = np.random.default_rng()
+        self._template = np.sin(2 * np.pi * self.signal_frequency * time[None, :] + phases) + \
+            self.noise * rng.standard_normal((len(self.channels), 2 * n_samples))
+        self._offset = 0
+
+    def fill(self, array):
+        """Copies the next block of simulated samples into array of shape (n_channels, n_samples)"""
+        n_samples = array.shape[-1]
+        np.copyto(array, self._template[:array.shape[0], self._offset:self._offset + n_samples])
+        self._offset = (self._offset + n_samples) % (self._template.shape[-1] - n_samples + 1)
+
+    def register_callback(self, callback, event='done', nsamples=1):
+        """callback is called as callback(taskhandle, event type, nsamples, callbackdata) every nsamples for the
+        'Nsamples' event, as callback(taskhandle, status) at the end of a finite acquisition for the 'done' event"""
+        self.c_callback = callback
+        self.callback_event = event
+        self.callback_nsamples = nsamples
+
+    def readAnalog(self, Nchannels, clock_settings):
+        """Same behaviour as DAQmx.readAnalog: returns a newly allocated channel major flat array"""
+        data = np.zeros(clock_settings.Nsamples * Nchannels, dtype=np.float64)
+        self.fill(data.reshape((Nchannels, clock_settings.Nsamples)))
+        return data
+
+    def isTaskDone(self):
+        return self._task is None or not self._task.running
+
+    def stop(self):
+        if self._task is not None:
+            self._task.StopTask()
+
+    def start(self):
+        if self._task is not None:
+            self._task.StartTask()
+
+    def close(self):
+        self.stop()
+        self._task = None
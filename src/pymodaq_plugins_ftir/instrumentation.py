@@ -0,0 +1,92 @@
+"""
+Lightweight timing instrumentation of the FTIR app.
+
+The hot paths only call start and stop (or add with an already measured duration): when the instrumentation is
+disabled, start returns None and stop returns immediately, so that the cost is a flag test. When enabled, each
+duration is appended to a bounded deque per timer. The rolling percentiles are only computed when they are
+displayed, typically once per second, by the TimingsTable of the timings dock.
+"""
+import collections
+import time
+
+import numpy as np
+from qtpy import QtWidgets
+
+PERCENTILES = (50, 90, 99)
+
+
+class RollingTimings:
+    """Keeps the last durations of named timers
+
+    Parameters
+    ----------
+    history: (int) number of durations kept per timer
+    enabled: (bool) if False, nothing is recorded
+    """
+
+    def __init__(self, history=500, enabled=False):
+        self.enabled = enabled
+        self._history = history
+        self._durations = {}
+
+    @property
+    def history(self):
+        return self._history
+
+    @history.setter
+    def history(self, history):
+        self._history = history
+        self._durations = {name: collections.deque(durations, maxlen=history)
+                           for name, durations in self._durations.items()}
+
+    def reset(self):
+        self._durations = {}
+
+    def start(self):
+        """Time stamp to be given to stop, None if disabled"""
+        if self.enabled:
+            return time.perf_counter()
+
+    def stop(self, name, start):
+        """Records the time elapsed since start (returned by start) for the timer name"""
+        if start is not None:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, duration):
+        """Records a duration in seconds for the timer name"""
+        if not self.enabled:
+            return
+        if name not in self._durations:
+            self._durations[name] = collections.deque(maxlen=self._history)
+        self._durations[name].append(duration)
+
+    def percentiles(self):
+        """Rolling percentiles (PERCENTILES) in seconds and number of samples of each timer, in insertion order"""
+        return {name: (tuple(np.percentile(durations, PERCENTILES)), len(durations))
+                for name, durations in list(self._durations.items()) if len(durations) > 0}
+
+    def summary(self):
+        """One line text of the median and 99th percentile of each timer, in ms, for the logger"""
+        return ', '.join([f'{name}: {values[0] * 1000:.2f}/{values[-1] * 1000:.2f}'
+                          for name, (values, count) in self.percentiles().items()])
+
+
+class TimingsTable(QtWidgets.QTableWidget):
+    """Table of the rolling percentiles (ms) of a RollingTimings, one row per timer"""
+
+    def __init__(self, parent=None):
+        super().__init__(0, len(PERCENTILES) + 1, parent)
+        self.setHorizontalHeaderLabels([f'p{percentile} (ms)' for percentile in PERCENTILES] + ['N'])
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+
+    def show_percentiles(self, percentiles):
+        self.setRowCount(len(percentiles))
+        self.setVerticalHeaderLabels(list(percentiles.keys()))
+        for row, (values, count) in enumerate(percentiles.values()):
+            for column, text in enumerate([f'{value * 1000:.3f}' for value in values] + [str(count)]):
+                item = self.item(row, column)
+                if item is None:
+                    self.setItem(row, column, QtWidgets.QTableWidgetItem(text))
+                else:
+                    item.setText(text)
@@ -0,0 +1,128 @@
+"""
+Lazy access to the interferograms stored in a h5 file.
+
+Only the selected node is opened and the rows are read on request, either one by one or by chunks, so that files
+of any size are opened instantly and processed with a constant memory footprint. With the h5py backend,
+contiguous uncompressed datasets (e.g. written by other programs) are memory-mapped instead of read through the HDF5
+library. The files written by saving.FTIRWriter are chunked and compressed hence always read through the library.
+"""
+import numpy as np
+from qtpy import QtWidgets
+
+from pymodaq.utils.h5modules.backends import H5Backend
+from pymodaq.utils.h5modules.browsing import H5Browser
+
+
+def select_node(file_path, backend='tables'):
+    """Lets the user pick a node in the tree of the h5 file, without loading its data
+
+    Returns
+    -------
+    str: the path of the selected node, None if the selection has been cancelled
+    """
+    form = QtWidgets.QMainWindow()
+    browser = H5Browser(form, h5file_path=file_path, backend=backend)
+    dialog = QtWidgets.QDialog()
+    vlayout = QtWidgets.QVBoxLayout()
+    vlayout.addWidget(form)
+    dialog.setLayout(vlayout)
+    button_box = QtWidgets.QDialogButtonBox(parent=dialog)
+    button_box.addButton('OK', button_box.AcceptRole)
+    button_box.accepted.connect(dialog.accept)
+    button_box.addButton('Cancel', button_box.RejectRole)
+    button_box.rejected.connect(dialog.reject)
+    vlayout.addWidget(button_box)
+    dialog.setWindowTitle('Select the interferograms node in the tree')
+
+    node_path = browser.current_node_path if dialog.exec() == dialog.Accepted else None
+    browser.h5utils.close_file()
+    return node_path
+
+
+class LazyInterferograms:
+    """Row access to a 1D (single trace) or 2D (Nscans, Npts) array of interferograms stored in a h5 file
+
+    If the node has a 'delay' sibling of the same shape (as written by saving.FTIRWriter), it is used as the delay
+    axis of the rows: the rows are then already sampled on this uniform axis, whose step is the Index/Delay scaling
+    they have been processed with.
+
+    Parameters
+    ----------
+    file_path: (str or Path) the h5 file
+    node_path: (str) the path of the array node within the file
+    backend: (str) the pymodaq h5 backend used to read the file, 'tables' or 'h5py'
+    """
+
+    def __init__(self, file_path, node_path, backend='tables'):
+        self.file_path = file_path
+        self.node_path = node_path
+        self._h5 = H5Backend(backend)
+        self._h5.open_file(file_path, 'r')
+        self._array = self._map_or_read(self._h5.get_node(node_path).array)
+        self._delay = None
+        parent_path, _, name = node_path.rpartition('/')
+        if name != 'delay':
+            try:
+                delay = self._h5.get_node(f'{parent_path}/delay').array
+            except Exception:  # no delay node
+                delay = None
+            if delay is not None and delay.shape == self._array.shape:
+                self._delay = self._map_or_read(delay)
+
+    def _map_or_read(self, array):
+        """A read-only memory map of the dataset if possible, otherwise the backend array, sliced on request"""
+        if self._h5.backend == 'h5py' and array.chunks is None and array.compression is None:
+            offset = array.id.get_offset()
+            if offset is not None:
+                return np.memmap(self.file_path, dtype=array.dtype, mode='r', offset=offset, shape=array.shape)
+        return array
+
+    @property
+    def n_rows(self):
+        return 1 if self._array.ndim == 1 else self._array.shape[0]
+
+    @property
+    def n_points(self):
+        return self._array.shape[-1]
+
+    @property
+    def has_delay(self):
+        return self._delay is not None
+
+    def __len__(self):
+        return self.n_rows
+
+    def rows(self, start, stop=None):
+        """Reads the rows start to stop (excluded) as a (Nrows, Npts) array, a single row if stop is None"""
+        if stop is None:
+            return np.array(self._array[:] if self._array.ndim == 1 else self._array[start])
+        if self._array.ndim == 1:
+            return np.array(self._array[:])[None, :]
+        return np.array(self._array[start:stop])
+
+    def delay(self, start, stop=None):
+        """The delay axis of the rows start to stop (excluded), None if the file does not contain any"""
+        if self._delay is None:
+            return None
+        if self._delay.ndim == 1:
+            return np.array(self._delay[:]) if stop is None else np.array(self._delay[:])[None, :]
+        return np.array(self._delay[start] if stop is None else self._delay[start:stop])
+
+    def delay_step(self, row):
+        """The step (fs) of the uniform delay axis of the row, i.e. the Index/Delay scaling it has been stored with.
+        None if the file does not contain any delay axis"""
+        delay = self.delay(row)
+        if delay is None or len(delay) < 2:
+            return None
+        return float(delay[-1] - delay[0]) / (len(delay) - 1)
+
+    def iter_chunks(self, start=0, stop=None, chunk_size=64):
+        """Yields the (index of the first row, rows) chunks covering the rows start to stop (excluded)"""
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        for chunk_start in range(start, stop, chunk_size):
+            yield chunk_start, self.rows(chunk_start, min(chunk_start + chunk_size, stop))
+
+    def close(self):
+        self._array = None
+        self._delay = None
+        self._h5.close_file()
@@ -0,0 +1 @@
+from .pipeline import FTIRPipeline, FTIRResult
@@ -0,0 +1,88 @@
+"""
+Apodization windows of the FTIR processing.
+
+The windows are evaluated on the ZPD centered, uniformly sampled, delay axis of the corrected interferogram. As
+their parameters almost never change during a live grab, they are kept in a bounded LRU cache keyed by
+(window type, length, sampling step, center, width, order) and returned as read-only arrays.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from pymodaq.utils import math_utils as mutils
+
+APODIZATIONS = ['HyperGaussian', 'Happ-Genzel', 'Blackman-Harris', 'Norton-Beer weak', 'Norton-Beer medium',
+                'Norton-Beer strong']
+
+BLACKMAN_HARRIS_COEFFS = (0.35875, 0.48829, 0.14128, 0.01168)
+NORTON_BEER_COEFFS = {'Norton-Beer weak': (0.384093, -0.087577, 0.703484),
+                      'Norton-Beer medium': (0.152442, -0.136176, 0.983734),
+                      'Norton-Beer strong': (0.045335, 0., 0.554883, 0., 0.399782)}
+
+WINDOW_CACHE_SIZE = 32
+
+
+def get_window(kind, x, center, width, order=4):
+    """Computes an apodization window along the vector x
+
+    Parameters
+    ----------
+    kind: (str) one of APODIZATIONS
+    x: (ndarray) the delay axis
+    center: (float) the center of the window
+    width: (float) the FWHM of the HyperGaussian window, the full extent of the other (finite support) windows
+    order: (int) the order of the HyperGaussian window, not used by the other windows
+
+    Returns
+    -------
+    ndarray: the window values along x
+    """
+    if kind == 'HyperGaussian':
+        return mutils.gauss1D(x, center, width, order)
+    if width <= 0:
+        raise ValueError('The width of the apodization window should be strictly positive')
+
+    u = (x - center) / (width / 2)
+    inside = np.abs(u) <= 1
+    if kind == 'Happ-Genzel':
+        window = 0.54 + 0.46 * np.cos(np.pi * u)
+    elif kind == 'Blackman-Harris':
+        window = sum([coeff * np.cos(ind * np.pi * u) for ind, coeff in enumerate(BLACKMAN_HARRIS_COEFFS)])
+    elif kind in NORTON_BEER_COEFFS:
+        window = np.polynomial.polynomial.polyval(1 - u ** 2, NORTON_BEER_COEFFS[kind])
+    else:
+        raise ValueError(f'Unknown apodization window {kind}, should be one of {APODIZATIONS}')
+    return np.where(inside, window, 0.)
+
+
+@lru_cache(maxsize=WINDOW_CACHE_SIZE)
+def cached_window(kind, npts, step, center, width, order=4):
+    """Apodization window on the centered axis (np.arange(npts) - (npts - 1) / 2) * step, kept in a LRU cache
+
+    See get_window for the parameters. The returned array is read-only as it is shared between callers.
+    """
+    window = get_window(kind, (np.arange(npts) - (npts - 1) / 2) * step, center, width, order)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=WINDOW_CACHE_SIZE)
+def cached_mertz_window(kind, npts, core, step, center, width, order=4):
+    """Apodization window of a one-sided interferogram multiplied by the Mertz ramp, kept in a LRU cache
+
+    The axis is (np.arange(npts) - core) * step, i.e. the ZPD at index core. The ramp rises linearly from 0 at -core
+    to 1 at +core (0.5 at the ZPD) so that the double-sided core is not counted twice. See get_window for the other
+    parameters. The returned array is read-only as it is shared between callers.
+    """
+    x = (np.arange(npts) - core) * step
+    window = get_window(kind, x, center, width, order) * np.clip((x / (core * step) + 1) / 2, 0, 1)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=WINDOW_CACHE_SIZE)
+def cached_core_window(core):
+    """Triangular window over the 2 * core + 1 points of the double-sided core, used for the phase estimation"""
+    window = 1 - np.abs(np.arange(-core, core + 1)) / (core + 1)
+    window.flags.writeable = False
+    return window
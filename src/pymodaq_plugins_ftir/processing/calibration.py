@@ -0,0 +1,99 @@
+"""
+Automatic calibration of the Index/Delay scaling from the fringes of a trace.
+
+The fringes of a reference laser (or of the interferogram itself, around the central wavelength of the source) have a
+period, in samples, set by the stage speed and the sampling frequency. It is estimated from the peak of the FFT of the
+Hann windowed trace, refined below the frequency bin by a Gaussian (parabola on the log magnitude) interpolation. The
+estimation is cached: for the next traces, only three DFT coefficients around the cached frequency are evaluated
+(with cached complex exponentials) to measure the drift of the peak, and the full FFT is done again only if the trace
+length changes or if the drift exceeds a tolerance.
+"""
+from functools import lru_cache
+
+import numpy as np
+from scipy import fft as sfft
+from scipy.constants import speed_of_light
+
+CALIBRATION_MODES = ['manual', 'reference', 'interferogram']
+MIN_BIN = 2  # the lowest frequency bins are excluded from the peak search (offset and slow drifts)
+
+
+def scaling_from_period(wavelength, period):
+    """Index/Delay scaling (fs) given a fringe period in samples of a light of wavelength (nm)"""
+    return wavelength / (speed_of_light * 1e-6) / period
+
+
+@lru_cache(maxsize=4)
+def _hann(npts):
+    window = np.hanning(npts)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=2)  # 3 complex rows of the trace length each
+def _dft_kernels(npts, frequencies):
+    kernels = np.exp(-2j * np.pi * np.outer(frequencies, np.arange(npts))) * _hann(npts)
+    kernels.flags.writeable = False
+    return kernels
+
+
+def _gaussian_offset(left, center, right):
+    """Sub-bin offset of the peak from three magnitudes, -0.5 to 0.5 when center is the largest"""
+    left, center, right = np.log(np.maximum((left, center, right), np.finfo(float).tiny))
+    curvature = left - 2 * center + right
+    if curvature >= 0:
+        return 0.
+    return 0.5 * (left - right) / curvature
+
+
+def fringe_frequency(y):
+    """Frequency (cycles per sample) of the strongest fringes of the trace y, with sub-bin precision"""
+    y = np.asarray(y, dtype=float)
+    npts = len(y)
+    if npts < 2 * MIN_BIN + 2:
+        raise ValueError('The trace is too short to estimate its fringe period')
+    spectrum = np.abs(sfft.rfft((y - np.mean(y)) * _hann(npts)))
+    index = int(np.argmax(spectrum[MIN_BIN:-1])) + MIN_BIN
+    return (index + _gaussian_offset(*spectrum[index - 1:index + 2])) / npts
+
+
+class FringeCalibrator:
+    """Estimates the fringe period of successive traces, re-estimated only on length change or drift
+
+    Parameters
+    ----------
+    tolerance: (float) relative drift of the fringe frequency above which it is estimated again
+    """
+
+    def __init__(self, tolerance=1e-3):
+        self.tolerance = tolerance
+        self.estimations = 0
+        self._state = None  # (npts, frequency), replaced at once so that it can be read from another thread
+
+    def reset(self):
+        self._state = None
+
+    @property
+    def period(self):
+        """The cached fringe period in samples, None if not estimated yet"""
+        if self._state is not None:
+            return 1 / self._state[1]
+
+    def drift(self, y, state=None):
+        """Relative drift of the fringe frequency of y with respect to the cached one, from three DFT coefficients"""
+        npts, frequency = state if state is not None else self._state
+        kernels = _dft_kernels(npts, (frequency - 1 / npts, frequency, frequency + 1 / npts))
+        left, center, right = np.abs(kernels @ (y - np.mean(y)))
+        if center < max(left, right):  # the peak moved by more than a bin
+            return np.inf
+        return _gaussian_offset(left, center, right) / npts / frequency
+
+    def update(self, y):
+        """Returns the fringe period (samples) of the trace y, from the cache unless it has to be estimated again"""
+        y = np.asarray(y, dtype=float)
+        state = self._state
+        if state is None or state[0] != len(y) or abs(self.drift(y, state)) > self.tolerance:
+            state = (len(y), fringe_frequency(y))
+            self._state = state
+            self.estimations += 1
+        return 1 / state[1]
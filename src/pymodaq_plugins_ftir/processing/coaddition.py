@@ -0,0 +1,113 @@
+"""
+Phase aligned co-addition of repeated interferograms.
+
+Successive sweeps are not acquired at exactly the same delay: the ZPD jitters by a few samples from one trace to
+the next, so that a plain average washes out the fringes. Each new trace is therefore aligned on the running
+average before being accumulated: the shift is given by the maximum of their FFT based cross-correlation, refined at
+sub-sample precision by a parabolic interpolation, and the trace is shifted by a Fourier phase ramp. Only the sum of
+the aligned traces is kept in memory.
+"""
+import numpy as np
+from scipy import fft as sfft
+
+
+def parabolic_peak(values, index):
+    """Sub-sample position of the maximum of values around the integer index, from a parabola through 3 points"""
+    if index == 0 or index == len(values) - 1:
+        return float(index)
+    left, center, right = values[index - 1], values[index], values[index + 1]
+    curvature = left - 2 * center + right
+    if curvature == 0:
+        return float(index)
+    return index + 0.5 * (left - right) / curvature
+
+
+def estimate_shift(y, reference, max_shift=None):
+    """Delay, in samples, of the trace y with respect to the reference from their cross-correlation
+
+    Both traces are zero padded so that the correlation is linear and not circular.
+
+    Parameters
+    ----------
+    y: (ndarray) the trace to be aligned
+    reference: (ndarray) the reference trace, same length as y
+    max_shift: (int) if not None, the shift is searched within [-max_shift, max_shift] samples
+
+    Returns
+    -------
+    float: the shift such that y[n] ~ reference[n - shift]
+    """
+    npts = len(y)
+    nfft = sfft.next_fast_len(2 * npts, real=True)
+    correlation = sfft.irfft(sfft.rfft(y - np.mean(y), nfft) * np.conj(sfft.rfft(reference - np.mean(reference), nfft)),
+                             nfft)
+    correlation = np.fft.fftshift(correlation)  # zero lag at index nfft // 2
+    if max_shift is not None:
+        lags = np.abs(np.arange(nfft) - nfft // 2)
+        correlation = np.where(lags <= max_shift, correlation, -np.inf)
+    index = int(np.argmax(correlation))
+    return parabolic_peak(correlation, index) - nfft // 2
+
+
+def fractional_shift(y, shift):
+    """Shifts the trace(s) y along their last axis by shift samples (y_shifted[n] = y[n - shift]) with a Fourier
+    phase ramp
+
+    The traces are padded with their mean value so that the samples leaving on one side do not wrap around to the
+    other. shift is either a float or an array with one value per trace (shape y.shape[:-1]).
+    """
+    npts = np.shape(y)[-1]
+    offset = np.mean(y, axis=-1, keepdims=True)
+    shift = np.asarray(shift, dtype=float)[..., None]
+    nfft = sfft.next_fast_len(npts + int(np.ceil(np.max(np.abs(shift)))) + 1, real=True)
+    spectrum = sfft.rfft(y - offset, nfft, axis=-1)
+    spectrum *= np.exp(-2j * np.pi * sfft.rfftfreq(nfft) * shift)
+    return sfft.irfft(spectrum, nfft, axis=-1)[..., :npts] + offset
+
+
+class CoAdder:
+    """Accumulates interferograms after aligning them on their running average
+
+    Parameters
+    ----------
+    max_shift: (int) maximum shift in samples searched for the alignment, None for no limit
+    """
+
+    def __init__(self, max_shift=None):
+        self.max_shift = max_shift
+        self._sum = None
+        self.count = 0
+        self.last_shift = 0.
+
+    def reset(self):
+        self._sum = None
+        self.count = 0
+        self.last_shift = 0.
+
+    @property
+    def average(self):
+        """The running average of the aligned traces, None if nothing has been added yet"""
+        if self._sum is None:
+            return None
+        return self._sum / self.count
+
+    def add(self, y):
+        """Aligns the trace y on the running average, accumulates it and returns the new average
+
+        Raises
+        ------
+        ValueError: if the length of y differs from the one of the traces accumulated so far
+        """
+        y = np.asarray(y, dtype=float)
+        if self._sum is None:
+            self._sum = y.copy()
+            self.count = 1
+            self.last_shift = 0.
+            return self.average
+
+        if y.shape != self._sum.shape:
+            raise ValueError(f'Cannot co-add a trace of shape {y.shape} to traces of shape {self._sum.shape}')
+        self.last_shift = estimate_shift(y, self.average, self.max_shift)
+        self._sum += fractional_shift(y, -self.last_shift)
+        self.count += 1
+        return self.average
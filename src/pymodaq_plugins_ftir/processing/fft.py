@@ -0,0 +1,122 @@
+"""
+Fourier transform helpers of the FTIR processing.
+
+The radial frequency axes are cached on (length, span) so that they are not recomputed each time a ROI is moved.
+The real-input path relies on scipy.fft: it pads the traces to a fast length (no large prime factors) and
+keeps the FFT plans in scipy's internal plan cache, so repeated transforms of the same length are cheap.
+
+The modulus of the transform only gives the spectrum of an interferogram scanned symmetrically around the ZPD. A
+one-sided interferogram (a short double-sided core around the ZPD and one long side) needs a phase correction: with
+the Mertz method, the phase is measured on the low resolution spectrum of the core and the spectrum is the real part
+of the transform of the full trace rotated by this phase.
+"""
+from functools import lru_cache
+
+import numpy as np
+from scipy import fft as sfft
+
+from pymodaq.utils import math_utils as mutils
+
+FFT_MODES = ['complex', 'real']
+PHASE_CORRECTIONS = ['none', 'mertz']
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+@lru_cache(maxsize=16)
+def complex_frequency_axis(npts, span):
+    """Radial frequency axis (rad/fs) of the centered complex FFT of npts points spanning span fs"""
+    omega, _ = mutils.ftAxis_time(npts, span)
+    return _read_only(omega)
+
+
+@lru_cache(maxsize=16)
+def real_frequency_axis(npts, span):
+    """Radial frequency axis (rad/fs) of the padded real FFT of npts points spanning span fs
+
+    Only the positive frequencies are returned, its length is nfft // 2 + 1 where nfft is the fast length
+    returned by fast_length
+    """
+    nfft = fast_length(npts)
+    return _read_only(2 * np.pi * sfft.rfftfreq(nfft, d=span / (npts - 1)))
+
+
+@lru_cache(maxsize=16)
+def fast_length(npts):
+    """Smallest length larger or equal to npts that is efficiently handled by scipy.fft for real inputs"""
+    return sfft.next_fast_len(npts, real=True)
+
+
+def complex_spectrum(y, span):
+    """Modulus of the centered inverse FFT of y along its last axis, as done by math_utils.ift
+
+    Returns
+    -------
+    omega: (ndarray) the radial frequency axis in rad/fs (negative and positive frequencies)
+    spectrum: (ndarray) the spectral density
+    """
+    npts = np.shape(y)[-1]
+    return complex_frequency_axis(npts, span), np.abs(mutils.ift(y, dim=np.ndim(y) - 1))
+
+
+def real_spectrum(y, span, workers=-1):
+    """Modulus of the FFT of the real array y along its last axis, zero padded to a fast length
+
+    The normalization matches the one of complex_spectrum (1/npts) so that both modes can be compared.
+
+    Parameters
+    ----------
+    y: (ndarray) real data, the transform is done along the last axis
+    span: (float) the delay range covered by the last axis of y (fs)
+    workers: (int) number of threads used by scipy.fft, -1 for all the available cores
+
+    Returns
+    -------
+    omega: (ndarray) the positive radial frequency axis in rad/fs
+    spectrum: (ndarray) the spectral density
+    """
+    npts = np.shape(y)[-1]
+    spectrum = np.abs(sfft.rfft(y, n=fast_length(npts), axis=-1, workers=workers))
+    spectrum /= npts
+    return real_frequency_axis(npts, span), spectrum
+
+
+def _zpd_first(y, zpd, nfft):
+    """Zero pads y to nfft points along its last axis with the sample zpd moved to index 0 and the samples before it
+    wrapped at the end, as expected by the FFT for a trace centered on the ZPD"""
+    padded = np.zeros(np.shape(y)[:-1] + (nfft,))
+    padded[..., :np.shape(y)[-1] - zpd] = y[..., zpd:]
+    if zpd > 0:
+        padded[..., nfft - zpd:] = y[..., :zpd]
+    return padded
+
+
+def mertz_spectrum(y, y_core, core, span, workers=-1):
+    """Phase corrected spectrum of one-sided interferogram(s) with the Mertz method
+
+    Parameters
+    ----------
+    y: (ndarray) the one-sided interferogram(s) along the last axis, ZPD at index core, weighted by the Mertz ramp
+        (and apodized) so that the samples measured on both sides of the ZPD are not counted twice
+    y_core: (ndarray) the double-sided part of the interferogram(s), 2 * core + 1 points centered on the ZPD, apodized
+    core: (int) the number of points measured before the ZPD
+    span: (float) the delay range covered by the last axis of y (fs)
+    workers: (int) number of threads used by scipy.fft, -1 for all the available cores
+
+    Returns
+    -------
+    omega: (ndarray) the positive radial frequency axis in rad/fs, as returned by real_spectrum for y
+    spectrum: (ndarray) the real, phase corrected, spectral density, normalized as real_spectrum would normalize the
+        equivalent double-sided interferogram
+    """
+    npts = np.shape(y)[-1]
+    nfft = fast_length(npts)
+    spectrum = sfft.rfft(_zpd_first(y, core, nfft), axis=-1, workers=workers)
+    # zero padding the core to the same length interpolates its low resolution phase on the full frequency axis
+    phase = np.angle(sfft.rfft(_zpd_first(y_core, core, nfft), axis=-1, workers=workers))
+    spectrum = np.real(spectrum * np.exp(-1j * phase))
+    spectrum /= npts - core  # the equivalent double-sided trace has 2 * (npts - core) points
+    return real_frequency_axis(npts, span), spectrum
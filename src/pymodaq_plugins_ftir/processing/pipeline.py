@@ -0,0 +1,551 @@
+"""
+Interferogram to spectrum processing chain of the FTIR extension.
+
+Nothing in here touches Qt widgets: the processing only needs numpy arrays and plain parameters so that it can
+be profiled, benchmarked and run outside of the GUI thread.
+"""
+import time
+
+import numpy as np
+
+from pymodaq.utils import math_utils as mutils
+from pymodaq.utils.units import l2w
+
+from pymodaq_plugins_ftir.processing import fft as ftir_fft
+from pymodaq_plugins_ftir.processing.calibration import FringeCalibrator, scaling_from_period
+from pymodaq_plugins_ftir.processing.apodization import cached_window, cached_mertz_window, cached_core_window
+from pymodaq_plugins_ftir.processing.resampling import fringe_delay, resample_on_fringes, resample_on_delay
+from pymodaq_plugins_ftir.processing.wavelength import to_uniform_wavelength
+from pymodaq_plugins_ftir.processing.zpd import locate_zpd
+from pymodaq_plugins_ftir.processing.coaddition import fractional_shift
+
+OMEGA_MIN = 0.4  # rad/fs, lower bound of the spectral ROI used for the wavelength conversion
+
+STAGES = ('delay', 'correction', 'filtering', 'fft', 'wavelength')
+# the first stage affected by each parameter
+STAGE_PARAMETERS = dict(scaling='delay', calibration='delay', calibration_tolerance='delay', resample='delay',
+                        reference_wavelength='delay', use_position='delay', position_scaling='delay',
+                        zpd_window='correction', zpd_method='correction', phase_correction='correction',
+                        phase_core='correction', apodization_window='filtering',
+                        apodization='filtering', apodization_order='filtering', fft_mode='fft', fft_workers='fft',
+                        spectral_roi='wavelength', wavelength_grid='wavelength')
+
+
+def _same_value(value, other):
+    if value is None or other is None:
+        return value is other
+    try:
+        return bool(np.array_equal(value, other))
+    except (TypeError, ValueError):
+        return value == other
+
+
+class FTIRResult:
+    """Container for all the intermediate products of the FTIR processing chain
+
+    When a batch of interferograms is processed, the per-scan products are stacked along their first axis.
+
+    Attributes
+    ----------
+    y_raw: (ndarray) the raw interferogram
+    reference: (ndarray) the reference laser interferogram recorded with y_raw, if any
+    position: (ndarray) the stage position at each sample of y_raw, if recorded
+    x_raw: (ndarray) the acquisition axis (index units) of y_raw
+    raw_scaling: (float) the Index/Delay scaling (fs) given with y_raw when it is already sampled on a delay grid (e.g.
+        reloaded from a file written by saving.FTIRWriter), used instead of the calibration. None otherwise
+    sample_delay: (ndarray) the delay (fs) of each raw sample on the x_delay axis, for the first trace of a batch
+    scaling: (float) the Index/Delay scaling (fs) used for x_delay, None if the trace was resampled
+    x_delay: (ndarray) delay axis (fs), uniformly sampled
+    y_delay: (ndarray) the interferogram sampled on x_delay, either y_raw or its resampling on the reference fringes
+    zpd_index: (int or float) index of the Zero Path Difference in the raw interferogram, or its sub-sample position
+        if the ZPD is refined (see FTIRPipeline zpd_method)
+    x_corrected: (ndarray) delay axis centered on the ZPD (fs)
+    y_corrected: (ndarray) ZPD centered, offset corrected and normalized interferogram
+    window: (ndarray) apodization window evaluated on x_corrected
+    y_filtered: (ndarray) apodized interferogram, input of the FFT
+    omega: (ndarray) radial frequency axis (rad/fs)
+    spectrum: (ndarray) modulus of the Fourier transform of y_filtered
+    wavelength: (ndarray) wavelength axis (nm) of the spectral ROI, increasing
+    spectrum_wl: (ndarray) normalized spectral density in wavelength
+    """
+
+    def __init__(self):
+        self.y_raw = None
+        self.reference = None
+        self.position = None
+        self.x_raw = None
+        self.raw_scaling = None
+        self.sample_delay = None
+        self.scaling = None
+        self.x_delay = None
+        self.y_delay = None
+        self.zpd_index = None
+        self.x_corrected = None
+        self.y_corrected = None
+        self.window = None
+        self.y_filtered = None
+        self.omega = None
+        self.spectrum = None
+        self.wavelength = None
+        self.spectrum_wl = None
+
+
+class FTIRPipeline:
+    """Headless FTIR processing: raw interferogram -> ZPD correction -> apodization -> FFT -> wavelength
+
+    Parameters
+    ----------
+    scaling: (float) Index/Delay scaling in fs
+    calibration: (str) one of calibration.CALIBRATION_MODES. With 'reference' (resp. 'interferogram'), the scaling is
+        not the scaling parameter but is estimated from the fringe period of the reference trace (resp. of the
+        interferogram, whose central wavelength should then be reference_wavelength). The estimation is cached in the
+        calibrator attribute and only redone when the trace length changes or the fringes drift
+    calibration_tolerance: (float) relative drift of the fringe period above which it is estimated again
+    resample: (bool) if True and a reference interferogram is given, the delay axis is deduced from the reference
+        fringes and the trace is resampled on it, otherwise the delay is the acquisition index times scaling
+    reference_wavelength: (float) wavelength in nm of the reference laser
+    use_position: (bool) if True, resample is False and a stage position trace is given, the delay of each sample is
+        measured from the stage position and the trace is resampled on a uniform delay grid
+    position_scaling: (float) delay in fs corresponding to a displacement of one stage unit
+    zpd_window: (tuple of 2 floats) delay interval (fs) in which the ZPD is searched. Its width also sets the length
+        of the corrected trace (without phase correction). If None, the central half of the delay axis is used
+        (the whole axis with phase correction)
+    zpd_method: (str) one of zpd.ZPD_METHODS. 'integer' centers the traces on the sample of maximum modulus, the
+        others refine the ZPD position below the sampling step and re-center the traces on it with a Fourier phase
+        ramp
+    phase_correction: (str) one of fft.PHASE_CORRECTIONS. With 'mertz', the interferogram may be one-sided: only a
+        short double-sided core around the ZPD is needed, its phase is used to correct the spectrum of the whole trace
+        (always computed with the real FFT)
+    phase_core: (float) half width (fs) of the double-sided core used for the Mertz phase. If None, all the points
+        measured on the short side of the ZPD are used
+    apodization_window: (tuple of 2 floats) delay interval (fs) on the corrected axis defining the center and the width
+        of the apodization window. If None, the central half of the corrected axis is used (the interval symmetric
+        around the ZPD reaching the end of the long side with phase correction)
+    apodization: (str) type of apodization window, one of apodization.APODIZATIONS
+    apodization_order: (int) order of the HyperGaussian apodization window
+    spectral_roi: (tuple of 2 floats) radial frequency interval (rad/fs) converted to wavelength. The lower bound is
+        clipped to OMEGA_MIN. If None, the whole positive frequency range is used
+    wavelength_grid: (tuple) (start, stop, npts) of a uniform wavelength grid (nm) onto which the spectrum is
+        interpolated. If None, the spectrum is given on the non-uniform wavelengths of the frequency samples
+    fft_mode: (str) one of fft.FFT_MODES. 'complex' is the centered complex FFT of math_utils, 'real' is the faster
+        real input FFT padded to a fast length, returning only the positive frequencies
+    fft_workers: (int) number of threads used by the real FFT, -1 for all the available cores
+
+    Notes
+    -----
+    Besides the stateless process and process_batch methods, the pipeline can be used incrementally: set_data stores
+    a new trace and update only recomputes the stages (see STAGES) that are downstream of a changed parameter, the
+    outputs of the other ones being kept in the result attribute.
+
+    The duration in seconds of each stage run by the last call to update, process or process_batch is stored in the
+    timings dictionary.
+    """
+
+    def __init__(self, scaling=1., calibration='manual', calibration_tolerance=1e-3, resample=False,
+                 reference_wavelength=632., use_position=False, position_scaling=1., zpd_window=None,
+                 zpd_method='integer', phase_correction='none', phase_core=None,
+                 apodization_window=None, apodization='HyperGaussian', apodization_order=4, spectral_roi=None,
+                 wavelength_grid=None, fft_mode='complex', fft_workers=-1):
+        self._dirty = set(STAGES)
+        self._x_raw = None
+        self.result = FTIRResult()
+        self.updated_stages = []
+        self.timings = {}
+        self.calibrator = FringeCalibrator(calibration_tolerance)
+
+        self.scaling = scaling
+        self.calibration = calibration
+        self.calibration_tolerance = calibration_tolerance
+        self.resample = resample
+        self.reference_wavelength = reference_wavelength
+        self.use_position = use_position
+        self.position_scaling = position_scaling
+        self.zpd_window = zpd_window
+        self.zpd_method = zpd_method
+        self.phase_correction = phase_correction
+        self.phase_core = phase_core
+        self.apodization_window = apodization_window
+        self.apodization = apodization
+        self.apodization_order = apodization_order
+        self.spectral_roi = spectral_roi
+        self.wavelength_grid = wavelength_grid
+        self.fft_mode = fft_mode
+        self.fft_workers = fft_workers
+
+    def __setattr__(self, name, value):
+        if name == 'fft_workers' and value == 0:
+            raise ValueError('fft_workers must not be zero, -1 for all the available cores')
+        if name in STAGE_PARAMETERS and not _same_value(getattr(self, name, None), value):
+            self.invalidate(STAGE_PARAMETERS[name])
+            if name == 'calibration':
+                self.calibrator.reset()
+            elif name == 'calibration_tolerance':
+                self.calibrator.tolerance = value
+        super().__setattr__(name, value)
+
+    def parameters(self):
+        """The processing parameters, as keyword arguments of the constructor"""
+        return {name: getattr(self, name) for name in STAGE_PARAMETERS}
+
+    def invalidate(self, stage):
+        """Marks the given stage and all the downstream ones as to be recomputed"""
+        self._dirty.update(STAGES[STAGES.index(stage):])
+
+    def is_dirty(self, stage):
+        return stage in self._dirty
+
+    def set_data(self, y_raw, x_raw=None, reference=None, position=None, scaling=None):
+        """Stores a new raw trace (or batch of traces) to be processed by update
+
+        Parameters
+        ----------
+        y_raw: (ndarray) the raw interferogram(s)
+        x_raw: (ndarray) the acquisition axis in index units. If None, np.arange(Npts) is used
+        reference: (ndarray) the reference laser interferogram(s) used when resample is True
+        position: (ndarray) the stage position at each sample, used when use_position is True
+        scaling: (float) the Index/Delay scaling (fs) of x_raw if already known (trace sampled on a delay grid), used
+            instead of the calibration. If None, the calibration applies
+        """
+        y_raw = np.asarray(y_raw)
+        if x_raw is None:
+            x_raw = np.arange(y_raw.shape[-1])
+        self._x_raw = np.asarray(x_raw)
+        self.result.y_raw = y_raw
+        self.result.reference = reference
+        self.result.position = position
+        self.result.raw_scaling = scaling
+        self.invalidate('delay')  # y_delay is y_raw itself when not resampled, the stage is then cheap
+
+    def update(self):
+        """Recomputes the stages whose inputs changed since the last call
+
+        If a stage fails, the exception is raised and the stages recomputed so far remain listed in updated_stages.
+
+        Returns
+        -------
+        list of str: the recomputed stages, in processing order. Their products are updated in the result attribute
+        """
+        self.updated_stages = []
+        self.timings = {}
+        if self.result.y_raw is None:
+            raise ValueError('No data to process, call set_data first')
+        for stage in STAGES:
+            if stage in self._dirty:
+                self._run_stage(stage, self.result, self._x_raw)
+                self._dirty.discard(stage)
+                self.updated_stages.append(stage)
+        return self.updated_stages
+
+    def _run_stage(self, stage, result, x_raw):
+        start = time.perf_counter()
+        try:
+            self._compute_stage(stage, result, x_raw)
+        finally:
+            self.timings[stage] = time.perf_counter() - start
+
+    def _compute_stage(self, stage, result, x_raw):
+        if stage == 'delay':
+            result.scaling = None
+            result.x_raw = x_raw
+            if self.resample and result.reference is not None:
+                result.x_delay, result.y_delay = resample_on_fringes(result.y_raw, result.reference,
+                                                                     self.reference_wavelength)
+                result.sample_delay = self.fringe_sample_delay(result.reference)
+            elif self.use_position and result.position is not None:
+                delay = self.measured_delay(result.position)
+                result.x_delay, result.y_delay = resample_on_delay(result.y_raw, delay)
+                result.sample_delay = delay[0] if delay.ndim == 2 else delay
+            else:
+                result.scaling = self.delay_scaling(result)
+                result.x_delay, result.y_delay = self.delay_axis(x_raw, result.scaling), result.y_raw
+                result.sample_delay = result.x_delay
+        elif stage == 'correction':
+            result.x_corrected, result.y_corrected, result.zpd_index = self.correct(result.x_delay, result.y_delay)
+        elif stage == 'filtering':
+            result.window, result.y_filtered = self.apodize(result.x_corrected, result.y_corrected)
+        elif stage == 'fft':
+            result.omega, result.spectrum = self.fft(result.x_corrected, result.y_filtered, result.y_corrected)
+        elif stage == 'wavelength':
+            result.wavelength, result.spectrum_wl = self.to_wavelength(result.omega, result.spectrum)
+
+    @staticmethod
+    def central_half(x):
+        """Returns the interval spanning the central half of the vector x"""
+        return x[0] + (x[-1] - x[0]) / 4, x[0] + 3 * (x[-1] - x[0]) / 4
+
+    @staticmethod
+    def symmetric_extent(x):
+        """Returns the interval centered on 0 reaching the largest absolute value of the vector x"""
+        extent = float(np.max(np.abs(x)))
+        return -extent, extent
+
+    def delay_axis(self, x_raw, scaling=None):
+        """Converts the acquisition axis (index) into a delay axis in fs, by default with the scaling parameter"""
+        return np.asarray(x_raw) * (self.scaling if scaling is None else scaling)
+
+    def delay_scaling(self, result):
+        """The Index/Delay scaling (fs), either the scaling parameter or its estimation from the fringes of the trace
+
+        For a batch, the fringe period is estimated on the first trace. The scaling given with the data, if any, takes
+        precedence.
+        """
+        if result.raw_scaling is not None:
+            return result.raw_scaling
+        if self.calibration == 'manual':
+            return self.scaling
+        trace = result.reference if self.calibration == 'reference' else result.y_raw
+        if trace is None:
+            raise ValueError('No reference trace to estimate the Index/Delay scaling from')
+        trace = np.asarray(trace)
+        period = self.calibrator.update(trace[0] if trace.ndim == 2 else trace)
+        return scaling_from_period(self.reference_wavelength, period)
+
+    def fringe_sample_delay(self, reference):
+        """Delay (fs) of each sample of the (first) reference trace from its fringes, constant beyond the first and
+        last zero crossings"""
+        reference = np.asarray(reference)
+        reference = reference[0] if reference.ndim == 2 else reference
+        index, delay = fringe_delay(reference, self.reference_wavelength)
+        return np.interp(np.arange(len(reference)), index, delay)
+
+    @staticmethod
+    def raw_to_delay(result, x):
+        """Delay (fs) on the x_delay axis of the result of values x of its acquisition axis, e.g. ROI bounds"""
+        return np.interp(x, result.x_raw, result.sample_delay)
+
+    def measured_delay(self, position):
+        """Converts the stage position trace(s) into a delay in fs, starting at 0 and increasing along the sweep"""
+        position = np.asarray(position, dtype=float)
+        delay = (position - position[..., :1]) * self.position_scaling
+        return delay * np.sign(delay[..., -1:] + (delay[..., -1:] == 0))
+
+    def correct(self, x_delay, y_raw):
+        """Centers the trace(s) around their ZPD, removes their offset and normalizes them
+
+        Parameters
+        ----------
+        x_delay: (ndarray) the uniformly sampled delay axis of length Npts
+        y_raw: (ndarray) either a single trace of shape (Npts,) or a batch of traces of shape (Nscans, Npts)
+
+        With phase correction, the traces are kept from the start of the double-sided core to the end of their long
+        side, reversed if the long side was measured before the ZPD.
+
+        Returns
+        -------
+        x_corrected: (ndarray) the delay axis centered on the ZPD (ZPD at 0 with phase correction), shared by all the
+            traces
+        y_corrected: (ndarray) the corrected and normalized interferogram(s), same dimensionality as y_raw
+        zpd_index: (int or ndarray of int) the index of the ZPD in the raw trace(s), or its sub-sample position (float)
+            if zpd_method is not 'integer'
+        """
+        y_raw = np.asarray(y_raw)
+        single = y_raw.ndim == 1
+        y_raw = np.atleast_2d(y_raw)
+        one_sided = self.phase_correction != 'none'
+
+        zpd_window = self.zpd_window
+        if zpd_window is None:
+            zpd_window = (x_delay[0], x_delay[-1]) if one_sided else self.central_half(x_delay)
+        index = mutils.find_index(x_delay, zpd_window)
+        half = int((index[1][0] - index[0][0]) / 2)
+        if half < 1:
+            raise ValueError('The ZPD window should span at least two points')
+
+        zpd_position = locate_zpd(y_raw[:, index[0][0]:index[1][0]], self.zpd_method) + index[0][0]
+        if one_sided:
+            x_corrected, y_corrected = self.select_one_sided(x_delay, y_raw, zpd_position)
+            return self._corrected_output(x_corrected, y_corrected, zpd_position, single)
+
+        zpd_index = np.rint(zpd_position).astype(int)
+
+        outside = np.flatnonzero((zpd_index - half < 0) | (zpd_index + half > y_raw.shape[-1]))
+        if outside.size != 0:
+            raise ValueError(f'The ZPD window around the maximum extends outside the trace(s) {outside.tolist()}')
+
+        x_selected = x_delay[zpd_index[0] - half:zpd_index[0] + half]
+        y_selected = self.select(y_raw, zpd_position, -half, half)
+
+        x_corrected = x_selected - np.mean(x_selected)
+        y_corrected = y_selected - np.mean(y_selected, axis=-1, keepdims=True)
+        y_corrected = y_corrected / np.max(np.abs(y_corrected), axis=-1, keepdims=True)
+        return self._corrected_output(x_corrected, y_corrected, zpd_position, single)
+
+    def _corrected_output(self, x_corrected, y_corrected, zpd_position, single):
+        if single:
+            zpd_position = zpd_position[0]
+            return x_corrected, y_corrected[0], int(zpd_position) if self.zpd_method == 'integer' else \
+                float(zpd_position)
+        return x_corrected, y_corrected, zpd_position
+
+    def select(self, y_raw, zpd_position, start, stop):
+        """Selects the samples start to stop (excluded) around the ZPD of each row of the 2D array y_raw
+
+        If the ZPD positions are not integers, the traces are shifted by a Fourier phase ramp so that their ZPD falls
+        exactly on the sample of index -start of the selection.
+        """
+        zpd_index = np.rint(zpd_position).astype(int)
+        y_selected = np.take_along_axis(y_raw, zpd_index[:, None] + np.arange(start, stop)[None, :], axis=-1)
+        residual = zpd_position - zpd_index
+        if np.any(residual != 0):
+            y_selected = fractional_shift(y_selected, -residual)
+        return y_selected
+
+    def select_one_sided(self, x_delay, y_raw, zpd_position):
+        """Selects the double-sided core and the long side of the 2D array of traces y_raw, see correct"""
+        npts = y_raw.shape[-1]
+        if zpd_position[0] > (npts - 1) / 2:  # the long side is before the ZPD
+            y_raw = y_raw[:, ::-1]
+            zpd_position = npts - 1 - zpd_position
+        zpd_index = np.rint(zpd_position).astype(int)
+        step = abs(float(x_delay[1] - x_delay[0]))
+        core = int(np.min(zpd_index))
+        if self.phase_core is not None:
+            core = min(core, int(round(self.phase_core / step)))
+        if core < 1:
+            raise ValueError('The phase correction needs points measured on both sides of the ZPD')
+        length = core + int(np.min(npts - zpd_index))
+
+        y_selected = self.select(y_raw, zpd_position, -core, length - core)
+        y_corrected = y_selected - np.mean(y_selected, axis=-1, keepdims=True)
+        y_corrected = y_corrected / np.max(np.abs(y_corrected), axis=-1, keepdims=True)
+        return (np.arange(length) - core) * step, y_corrected
+
+    @staticmethod
+    def core_length(x_corrected):
+        """Number of points before the ZPD of a one-sided corrected axis"""
+        return int(np.count_nonzero(x_corrected < 0))
+
+    def apodize(self, x_corrected, y_corrected):
+        """Multiplies the corrected interferogram(s) by the apodization window
+
+        The window is taken from a LRU cache so that it is only computed when its parameters change.
+
+        Returns
+        -------
+        window: (ndarray) the read-only apodization window
+        y_filtered: (ndarray) the apodized interferogram
+        """
+        step = (x_corrected[-1] - x_corrected[0]) / (len(x_corrected) - 1)
+        if self.phase_correction != 'none':
+            pos = self.apodization_window if self.apodization_window is not None else \
+                self.symmetric_extent(x_corrected)
+            window = cached_mertz_window(self.apodization, len(x_corrected), self.core_length(x_corrected),
+                                         float(step), float(np.mean(pos)), float(np.diff(pos)[0]),
+                                         int(self.apodization_order))
+            return window, y_corrected * window
+
+        pos = self.apodization_window if self.apodization_window is not None else self.central_half(x_corrected)
+        window = cached_window(self.apodization, len(x_corrected), float(step), float(np.mean(pos)),
+                               float(np.diff(pos)[0]), int(self.apodization_order))
+        return window, y_corrected * window
+
+    def fft(self, x_corrected, y_filtered, y_corrected=None):
+        """Computes the modulus of the Fourier transform of the apodized interferogram(s) along their last axis
+
+        With phase correction, the spectrum is instead the real part of the transform corrected by the phase of the
+        double-sided core of y_corrected.
+
+        Returns
+        -------
+        omega: (ndarray) the radial frequency axis in rad/fs
+        spectrum: (ndarray) the spectral density, stacked along the first axis for a batch
+        """
+        span = float(np.max(x_corrected) - np.min(x_corrected))
+        if self.phase_correction == 'mertz':
+            core = self.core_length(x_corrected)
+            y_core = y_corrected[..., :2 * core + 1] * cached_core_window(core)
+            return ftir_fft.mertz_spectrum(y_filtered, y_core, core, span, workers=self.fft_workers)
+        elif self.phase_correction != 'none':
+            raise ValueError(f'Unknown phase correction {self.phase_correction}, should be one of '
+                             f'{ftir_fft.PHASE_CORRECTIONS}')
+        if self.fft_mode == 'real':
+            return ftir_fft.real_spectrum(y_filtered, span, workers=self.fft_workers)
+        elif self.fft_mode == 'complex':
+            return ftir_fft.complex_spectrum(y_filtered, span)
+        else:
+            raise ValueError(f'Unknown FFT mode {self.fft_mode}, should be one of {ftir_fft.FFT_MODES}')
+
+    def to_wavelength(self, omega, spectrum):
+        """Converts the spectral density(ies) within the spectral ROI from radial frequency to wavelength
+
+        If wavelength_grid is set, the spectrum is interpolated onto this uniform grid (zero outside the ROI) with a
+        cached interpolation map.
+
+        Returns
+        -------
+        wavelength: (ndarray) the increasing wavelength axis in nm
+        spectrum_wl: (ndarray) the spectral density(ies) per unit wavelength, each normalized between 0 and 1
+        """
+        pos = list(self.spectral_roi) if self.spectral_roi is not None else [OMEGA_MIN, omega[-1]]
+        pos[0] = max((pos[0], OMEGA_MIN))
+        if self.wavelength_grid is not None:
+            wavelength, spectrum_wl = to_uniform_wavelength(omega, spectrum, self.wavelength_grid, pos)
+            if not np.all(np.any(spectrum_wl != 0, axis=-1)):
+                raise ValueError('The wavelength grid does not overlap the spectral ROI')
+            spectrum_wl = spectrum_wl - np.min(spectrum_wl, axis=-1, keepdims=True)
+            return wavelength, spectrum_wl / np.max(spectrum_wl, axis=-1, keepdims=True)
+
+        index = mutils.find_index(omega, pos)
+        omega_clipped = omega[index[0][0]: index[1][0]]
+        if len(omega_clipped) == 0:
+            raise ValueError('The spectral ROI does not contain any frequency point')
+        spectrum_clipped = spectrum[..., index[0][0]: index[1][0]]
+
+        wavelength = l2w(omega_clipped)[::-1]
+        spectrum_wl = spectrum_clipped[..., ::-1] / wavelength ** 2
+        spectrum_wl = spectrum_wl - np.min(spectrum_wl, axis=-1, keepdims=True)
+        return wavelength, spectrum_wl / np.max(spectrum_wl, axis=-1, keepdims=True)
+
+    def process(self, y_raw, x_raw=None, reference=None, position=None, scaling=None):
+        """Runs the whole processing chain on a single interferogram, independently of the incremental state
+
+        Parameters
+        ----------
+        y_raw: (ndarray) the raw interferogram
+        x_raw: (ndarray) the acquisition axis in index units. If None, np.arange(len(y_raw)) is used
+        reference: (ndarray) the reference laser interferogram used when resample is True
+        position: (ndarray) the stage position at each sample, used when use_position is True
+        scaling: (float) the Index/Delay scaling (fs) of x_raw if already known, used instead of the calibration
+
+        Returns
+        -------
+        FTIRResult
+        """
+        y_raw = np.asarray(y_raw)
+        if x_raw is None:
+            x_raw = np.arange(y_raw.shape[-1])
+
+        self.timings = {}
+        result = FTIRResult()
+        result.y_raw = y_raw
+        result.reference = reference
+        result.position = position
+        result.raw_scaling = scaling
+        for stage in STAGES:
+            self._run_stage(stage, result, x_raw)
+        return result
+
+    def process_batch(self, y_raw, x_raw=None, reference=None, position=None, scaling=None):
+        """Runs the whole processing chain on a batch of interferograms with vectorized numpy operations
+
+        All the traces should share the same acquisition axis.
+
+        Parameters
+        ----------
+        y_raw: (ndarray) the raw interferograms of shape (Nscans, Npts)
+        x_raw: (ndarray) the acquisition axis in index units of length Npts. If None, np.arange(Npts) is used
+        reference: (ndarray) the reference laser interferograms, same shape as y_raw, used when resample is True.
+            The traces are then resampled onto a common uniform delay grid
+        position: (ndarray) the stage positions, same shape as y_raw, used when use_position is True. The traces are
+            then resampled onto a common uniform delay grid
+        scaling: (float) the Index/Delay scaling (fs) of x_raw if already known, used instead of the calibration
+
+        Returns
+        -------
+        FTIRResult: the per-scan products are stacked along the first axis (y_raw, zpd_index, y_corrected,
+            y_filtered, spectrum and spectrum_wl) while the axes and the apodization window are shared
+        """
+        y_raw = np.asarray(y_raw)
+        if y_raw.ndim != 2:
+            raise ValueError('The batch of interferograms should be a 2D array of shape (Nscans, Npts)')
+        return self.process(y_raw, x_raw, reference, position, scaling)
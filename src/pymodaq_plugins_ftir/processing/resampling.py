@@ -0,0 +1,123 @@
+"""
+Resampling of the interferograms onto a uniform optical delay grid.
+
+The DAQ samples the detector at a fixed clock while the stage velocity ripples, so the sample index is not
+proportional to the delay. The zero crossings of a reference laser interferogram (HeNe) recorded simultaneously
+are separated by exactly half a reference period in delay: they are used to build the true delay of each sample
+before interpolating the signal onto a uniform delay grid. Everything is vectorized along the trace.
+
+Alternatively, the delay of each sample can be measured directly from the stage position recorded during the sweep
+(see resample_on_delay).
+"""
+import numpy as np
+from scipy.constants import speed_of_light
+
+MIN_CROSSING_SPACING = 0.3  # crossings closer than this fraction of the median spacing are considered as noise
+
+
+def zero_crossings(reference):
+    """Fractional indices of the zero crossings of the (offset corrected) reference signal
+
+    The crossing positions are linearly interpolated between the two samples of opposite signs. Spurious crossings
+    due to noise around zero (closer than MIN_CROSSING_SPACING times the median spacing) are removed.
+    """
+    reference = np.asarray(reference, dtype=float)
+    reference = reference - np.mean(reference)
+    sign = np.signbit(reference)
+    index = np.flatnonzero(sign[:-1] != sign[1:])
+    crossings = index + reference[index] / (reference[index] - reference[index + 1])
+    if len(crossings) > 2:
+        spacing = np.diff(crossings)
+        crossings = crossings[np.concatenate(([True], spacing > MIN_CROSSING_SPACING * np.median(spacing)))]
+    return crossings
+
+
+def fringe_delay(reference, wavelength):
+    """Delay (fs) of each sample of a trace computed from the zero crossings of the reference signal
+
+    Parameters
+    ----------
+    reference: (ndarray) the reference laser interferogram
+    wavelength: (float) the wavelength of the reference laser in nm
+
+    Returns
+    -------
+    index: (ndarray of int) the indices of the samples lying between the first and last crossings
+    delay: (ndarray) the delay of these samples in fs, starting at 0
+    """
+    crossings = zero_crossings(reference)
+    if len(crossings) < 2:
+        raise ValueError('The reference signal should contain at least two zero crossings')
+    half_period = wavelength / (speed_of_light * 1e-6) / 2  # speed of light in nm/fs
+    index = np.arange(int(np.ceil(crossings[0])), int(np.floor(crossings[-1])) + 1)
+    delay = np.interp(index, crossings, np.arange(len(crossings)) * half_period)
+    return index, delay
+
+
+def resample_on_fringes(y, reference, wavelength, step=None):
+    """Interpolates the trace(s) y onto a uniform delay grid deduced from the reference fringes
+
+    Parameters
+    ----------
+    y: (ndarray) the trace of shape (Npts,) or a batch of traces of shape (Nscans, Npts)
+    reference: (ndarray) the reference laser interferogram(s), same shape as y
+    wavelength: (float) the wavelength of the reference laser in nm
+    step: (float) the delay step (fs) of the uniform grid. If None, the mean delay step of the samples is used
+
+    Returns
+    -------
+    delay: (ndarray) the uniform delay grid in fs, common to all the traces of a batch
+    y_resampled: (ndarray) the resampled trace(s)
+    """
+    y = np.asarray(y)
+    reference = np.asarray(reference)
+    if y.shape != reference.shape:
+        raise ValueError('The reference should have the same shape as the trace(s)')
+    single = y.ndim == 1
+    y = np.atleast_2d(y)
+    reference = np.atleast_2d(reference)
+
+    sample_delays = [fringe_delay(ref, wavelength) for ref in reference]
+    if step is None:
+        step = np.mean([delay[-1] / (len(delay) - 1) for _, delay in sample_delays])
+    stop = min([delay[-1] for _, delay in sample_delays])
+    delay_grid = np.arange(0, stop + step / 2, step)
+
+    y_resampled = np.stack([np.interp(delay_grid, delay, trace[index])
+                            for (index, delay), trace in zip(sample_delays, y)])
+    return delay_grid, y_resampled[0] if single else y_resampled
+
+
+def resample_on_delay(y, delay, step=None):
+    """Interpolates the trace(s) y, sampled at the measured delays, onto a uniform delay grid
+
+    Parameters
+    ----------
+    y: (ndarray) the trace of shape (Npts,) or a batch of traces of shape (Nscans, Npts)
+    delay: (ndarray) the measured delay (fs) of each sample, same shape as y. The samples are sorted by delay before
+        the interpolation, so that the delay does not need to be strictly monotonic
+    step: (float) the delay step (fs) of the uniform grid. If None, the mean delay step of the samples is used
+
+    Returns
+    -------
+    delay: (ndarray) the uniform delay grid in fs, spanning the delay range common to all the traces of a batch
+    y_resampled: (ndarray) the resampled trace(s)
+    """
+    y = np.asarray(y)
+    delay = np.asarray(delay)
+    if y.shape != delay.shape:
+        raise ValueError('The delay should have the same shape as the trace(s)')
+    single = y.ndim == 1
+    order = np.argsort(np.atleast_2d(delay), axis=-1, kind='stable')
+    delay = np.take_along_axis(np.atleast_2d(delay), order, axis=-1)
+    y = np.take_along_axis(np.atleast_2d(y), order, axis=-1)
+
+    if step is None:
+        step = np.mean((delay[:, -1] - delay[:, 0]) / (delay.shape[-1] - 1))
+    if not step > 0:
+        raise ValueError('The measured delay should span a non zero range')
+    start = np.max(delay[:, 0])
+    delay_grid = np.arange(start, np.min(delay[:, -1]) + step / 2, step)
+
+    y_resampled = np.stack([np.interp(delay_grid, trace_delay, trace) for trace_delay, trace in zip(delay, y)])
+    return delay_grid, y_resampled[0] if single else y_resampled
@@ -0,0 +1,73 @@
+"""
+Conversion of the spectra from radial frequency to a uniform wavelength grid.
+
+The spectral density per unit wavelength at a wavelength l is S(w(l)) / l^2 with w(l) = l2w(l). On a uniform
+wavelength grid, w(l) falls between two samples of the uniform radial frequency axis and S is linearly interpolated.
+The indices of these samples and the interpolation weights, including the 1 / l^2 factor and the spectral ROI
+mask, only depend on the two grids: they are kept in a bounded LRU cache keyed by the grids and the ROI, so that each
+conversion is a single gather-and-multiply.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from pymodaq.utils.units import l2w
+
+MAP_CACHE_SIZE = 16
+
+
+def wavelength_grid(start, stop, npts):
+    """The uniform wavelength grid (nm) from start to stop (included) with npts points"""
+    return np.linspace(start, stop, int(npts))
+
+
+@lru_cache(maxsize=MAP_CACHE_SIZE)
+def wavelength_map(omega_start, omega_step, omega_npts, wl_start, wl_stop, wl_npts, roi=None):
+    """Interpolation map from a uniform radial frequency axis onto a uniform wavelength grid
+
+    Parameters
+    ----------
+    omega_start, omega_step, omega_npts: (float, float, int) the radial frequency axis (rad/fs)
+    wl_start, wl_stop, wl_npts: (float, float, int) the wavelength grid (nm), see wavelength_grid
+    roi: (tuple of 2 floats) radial frequency interval outside of which the converted spectrum is set to zero
+
+    Returns
+    -------
+    index: (ndarray of int) index of the lower neighbour on the frequency axis of each wavelength
+    weights: (ndarray) of shape (2, wl_npts): weights of the lower and upper neighbours, divided by l^2
+    The arrays are read-only as they are shared between callers.
+    """
+    wavelength = wavelength_grid(wl_start, wl_stop, wl_npts)
+    omega = l2w(wavelength)
+    position = (omega - omega_start) / omega_step
+    inside = (position >= 0) & (position <= omega_npts - 1)
+    if roi is not None:
+        inside &= (omega >= roi[0]) & (omega <= roi[1])
+    index = np.clip(np.floor(position).astype(int), 0, omega_npts - 2)
+    fraction = position - index
+    weights = np.stack((1 - fraction, fraction)) * np.where(inside, 1 / wavelength ** 2, 0.)
+    index.flags.writeable = False
+    weights.flags.writeable = False
+    return index, weights
+
+
+def to_uniform_wavelength(omega, spectrum, grid, roi=None):
+    """Converts spectral density(ies) on the uniform radial frequency axis omega onto a uniform wavelength grid
+
+    Parameters
+    ----------
+    omega: (ndarray) the uniform radial frequency axis in rad/fs
+    spectrum: (ndarray) the spectral density of shape (Nomega,) or (Nscans, Nomega)
+    grid: (tuple) (start, stop, npts) of the wavelength grid in nm
+    roi: (tuple of 2 floats) radial frequency interval kept, None for all of it
+
+    Returns
+    -------
+    wavelength: (ndarray) the wavelength grid in nm
+    spectrum_wl: (ndarray) the spectral density(ies) per unit wavelength on the grid, zero outside omega or the ROI
+    """
+    omega_step = float((omega[-1] - omega[0]) / (len(omega) - 1))
+    index, weights = wavelength_map(float(omega[0]), omega_step, len(omega), float(grid[0]), float(grid[1]),
+                                    int(grid[2]), None if roi is None else (float(roi[0]), float(roi[1])))
+    spectrum_wl = spectrum[..., index] * weights[0] + spectrum[..., index + 1] * weights[1]
+    return wavelength_grid(*grid), spectrum_wl
@@ -0,0 +1,75 @@
+"""
+Sub-sample localization of the Zero Path Difference.
+
+The ZPD found by an integer argmax is quantized to the sampling step, so that the recentred interferograms jitter by
+up to half a sample from one scan to the next, which shows up as a linear spectral phase noise. The position is
+refined around the integer maximum by a parabola through 3 points, either on the modulus of the trace (its central
+fringe) or on its envelope, the modulus of the analytic signal obtained by a Hilbert transform, which is smoother and
+less sensitive to the phase of the fringes. All the functions work along the last axis of batches of traces.
+"""
+import numpy as np
+from scipy import fft as sfft
+
+ZPD_METHODS = ['integer', 'parabolic', 'envelope']
+
+
+def hilbert_envelope(y):
+    """Modulus of the analytic signal of the trace(s) y (offset removed) along their last axis"""
+    npts = np.shape(y)[-1]
+    nfft = sfft.next_fast_len(npts)
+    spectrum = sfft.fft(y - np.mean(y, axis=-1, keepdims=True), nfft, axis=-1)
+    gain = np.zeros((nfft,))
+    gain[0] = 1
+    gain[1:(nfft + 1) // 2] = 2
+    if nfft % 2 == 0:
+        gain[nfft // 2] = 1
+    return np.abs(sfft.ifft(spectrum * gain, axis=-1)[..., :npts])
+
+
+def refine_peaks(values, index):
+    """Sub-sample positions of the maxima of the rows of values around their integer indexes
+
+    Parameters
+    ----------
+    values: (ndarray) 2D array of shape (Ntraces, Npts)
+    index: (ndarray of int) the index of the maximum of each row
+
+    Returns
+    -------
+    ndarray: the positions from a parabola through 3 points, the integer index on the edges or if the 3 points are
+        not concave
+    """
+    npts = values.shape[-1]
+    index = np.asarray(index)
+    left = np.take_along_axis(values, np.clip(index - 1, 0, npts - 1)[:, None], axis=-1)[:, 0]
+    center = np.take_along_axis(values, index[:, None], axis=-1)[:, 0]
+    right = np.take_along_axis(values, np.clip(index + 1, 0, npts - 1)[:, None], axis=-1)[:, 0]
+    curvature = left - 2 * center + right
+    valid = (index > 0) & (index < npts - 1) & (curvature < 0)
+    offset = np.divide(0.5 * (left - right), curvature, out=np.zeros(curvature.shape), where=valid)
+    return index + offset
+
+
+def locate_zpd(y, method='parabolic'):
+    """Position of the ZPD of each row of the 2D array y
+
+    Parameters
+    ----------
+    y: (ndarray) the traces, of shape (Ntraces, Npts), restricted to the interval where the ZPD is searched
+    method: (str) one of ZPD_METHODS: 'integer' for the maximum of the modulus of the traces, 'parabolic' for its
+        parabolic refinement and 'envelope' for the refined maximum of their Hilbert envelope
+
+    Returns
+    -------
+    ndarray: the index (int) or the sub-sample position (float) of the ZPD in each row
+    """
+    if method == 'envelope':
+        values = hilbert_envelope(y)
+    elif method in ('integer', 'parabolic'):
+        values = np.abs(y)
+    else:
+        raise ValueError(f'Unknown ZPD method {method}, should be one of {ZPD_METHODS}')
+    index = np.argmax(values, axis=-1)
+    if method == 'integer':
+        return index
+    return refine_peaks(values, index)
@@ -0,0 +1,160 @@
+"""
+Streaming of the FTIR results into a HDF5 file.
+
+Each processed sweep is appended as a new row of enlargeable (chunked and compressed) arrays created through the
+pymodaq h5 backends (pytables, h5py or h5pyd). All the file operations are done by a background thread fed by a
+bounded queue: writing never blocks the acquisition, sweeps arriving while the queue is full are dropped and counted.
+The offline processing of loaded files waits for room in the queue instead, so that no sweep is lost.
+
+File layout: /FTIR/Sweeps000/<field> where each field (raw, delay, filtered, spectrum, omega...) is an EARRAY of
+shape (Nsweeps, Npts). A new SweepsXXX group is started when the length of one of the fields changes.
+"""
+import queue
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from pymodaq.utils.h5modules.backends import H5Backend, backends_available
+from pymodaq.utils.logger import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+H5_BACKENDS = [backend for backend in ('tables', 'h5py') if backend in backends_available]  # pytables first
+ROOT_GROUP = 'FTIR'
+SEGMENT_PREFIX = 'Sweeps'
+
+
+class FTIRWriter:
+    """Appends named 1D arrays as rows of compressed enlargeable arrays from a background thread
+
+    Parameters
+    ----------
+    backend: (str) one of H5_BACKENDS, by default the first one that can be imported
+    compression_level: (int) zlib compression level, from 0 (no compression) to 9
+    queue_size: (int) maximum number of sweeps waiting to be written
+
+    Attributes
+    ----------
+    written: (int) number of sweeps written in the file
+    dropped: (int) number of sweeps dropped, either because the queue was full or because they could not be written
+    """
+
+    def __init__(self, backend=None, compression_level=5, queue_size=64):
+        self.backend = backend if backend is not None else H5_BACKENDS[0]
+        self.compression_level = compression_level
+        self.file_path = None
+        self.written = 0
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()  # sweeps are dropped by both the calling and the writing threads
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._h5 = None
+        self._segment_index = -1
+        self._shapes = None
+        self._arrays = {}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def open(self, file_path):
+        """Starts the writing thread, the file is created (or overwritten) by it"""
+        self.close()
+        self.file_path = file_path
+        self.written = 0
+        self.dropped = 0
+        opened = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(file_path, opened), name='FTIRWriter', daemon=True)
+        self._thread.start()
+        opened.wait()
+        if not self.running:
+            raise IOError(f'Could not open {file_path} for writing')
+
+    def write(self, block=False, **fields):
+        """Queues one sweep given as 1D arrays, one per field, for writing. Never blocks unless block is True
+
+        Parameters
+        ----------
+        block: (bool) if True, waits for room in the queue instead of dropping the sweep, for offline processing
+        fields: the 1D arrays of the sweep
+
+        Returns
+        -------
+        bool: False if the sweep has been dropped because the queue is full or the writer is not running
+        """
+        if not self.running:
+            return False
+        sweep = {name: np.asarray(value) for name, value in fields.items()}
+        if block:
+            while self.running:  # the writing thread may stop on an error while waiting
+                try:
+                    self._queue.put(sweep, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        try:
+            self._queue.put_nowait(sweep)
+            return True
+        except queue.Full:
+            self._drop()
+            return False
+
+    def _drop(self):
+        with self._dropped_lock:
+            self.dropped += 1
+
+    def close(self):
+        """Writes the queued sweeps, closes the file and stops the thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, file_path, opened):
+        try:
+            self._h5 = H5Backend(self.backend)
+            self._h5.open_file(file_path, 'w', title='FTIR')
+            self._h5.define_compression('zlib', self.compression_level)
+            self._h5.get_set_group(self._h5.root(), ROOT_GROUP, 'FTIR sweeps')
+            self._segment_index = -1
+            self._shapes = None
+            self._arrays = {}
+        except Exception as e:
+            logger.error(f'Could not open the h5 file {file_path}: {str(e)}')
+            opened.set()
+            return
+        opened.set()
+
+        try:
+            while True:
+                fields = self._queue.get()
+                if fields is None:
+                    break
+                try:
+                    self._append(fields)
+                    self.written += 1
+                except Exception as e:
+                    logger.warning(f'Could not write the sweep: {str(e)}')
+                    self._drop()
+                if self._queue.empty():
+                    self._h5.flush()
+        finally:
+            self._h5.close_file()
+
+    def _append(self, fields):
+        shapes = {name: value.shape for name, value in fields.items()}
+        if shapes != self._shapes:
+            self._new_segment(fields)
+            self._shapes = shapes
+        for name, value in fields.items():
+            self._arrays[name].append(value)
+
+    def _new_segment(self, fields):
+        self._segment_index += 1
+        segment = self._h5.get_set_group(f'/{ROOT_GROUP}', f'{SEGMENT_PREFIX}{self._segment_index:03d}')
+        segment.set_attr('date_time', datetime.now().isoformat())
+        self._arrays = {name: self._h5.create_earray(segment, name, value.dtype, data_shape=value.shape,
+                                                     title=name)
+                        for name, value in fields.items()}
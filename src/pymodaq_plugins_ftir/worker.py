@@ -0,0 +1,241 @@
+"""
+Processing of the FTIR updates outside of the GUI thread.
+
+The PipelineWorker owns the FTIRPipeline (and the co-addition of the sweeps) and lives in its own QThread: the GUI
+sends it jobs (new parameter values and/or a new trace) and receives, by signal, a snapshot of the processing result
+with the list of the recomputed stages and their durations. The GUI should not modify the pipeline directly once it
+has been given to the worker.
+
+The jobs are not queued but coalesced in a single slot mailbox: if jobs are submitted while the worker is busy, they
+are merged into one pending job so that the latency never grows when the detector is faster than the processing.
+Only the latest new frame is kept (the older ones are counted as dropped), unless the co-addition is enabled in
+which case the pending frames are folded into the co-added average, as long as they share the same acquisition axis
+and sweep direction.
+"""
+import copy
+import threading
+import time
+
+import numpy as np
+from qtpy.QtCore import QObject, QThread, Signal, Slot
+
+from pymodaq.utils.logger import set_logger, get_module_name
+
+from pymodaq_plugins_ftir.processing.coaddition import CoAdder
+
+logger = set_logger(get_module_name(__file__))
+
+
+def same_sweep(frame, other):
+    """True if both frames (set_data arguments) have the same acquisition axis and sweep direction, hence can be
+    co-added"""
+    return frame.get('direction') == other.get('direction') and \
+        np.array_equal(frame.get('x_raw'), other.get('x_raw')) and \
+        np.shape(frame['y_raw']) == np.shape(other['y_raw'])
+
+
+class ProcessingJob:
+    """What the worker should do: update some parameters and/or process a trace
+
+    Parameters
+    ----------
+    parameters: (dict) pipeline attributes (see pipeline.STAGE_PARAMETERS) to be set before processing
+    data: (dict) if not None, the arguments of FTIRPipeline.set_data (y_raw, x_raw, reference, position, scaling)
+        and optionally the direction of the sweep (direction)
+    new_frame: (bool) True if data is a new acquisition (co-added if enabled), False if it is the last one again, for
+        instance with another reference channel
+    process: (bool) if False, the parameters are only stored, nothing is recomputed
+    coaddition: (dict) co-addition settings among enabled (bool), max_shift (int or None) and reset (bool)
+
+    Attributes
+    ----------
+    submitted: (float) perf_counter time at which the latest data of the job was submitted, None without data
+    """
+
+    def __init__(self, parameters=None, data=None, new_frame=True, process=True, coaddition=None):
+        self.parameters = dict(parameters) if parameters is not None else {}
+        self.frames = [data] if data is not None and new_frame else []
+        self.replay = data if data is not None and not new_frame else None
+        self.process = process
+        self.coaddition = dict(coaddition) if coaddition is not None else {}
+        self.submitted = time.perf_counter() if data is not None else None
+
+    def merge(self, job: 'ProcessingJob', fold=False):
+        """Merges a more recent job into this one
+
+        Returns
+        -------
+        int: the number of frames of this job discarded by the merge
+        """
+        dropped = 0
+        self.parameters.update(job.parameters)
+        if job.coaddition.get('reset', False):
+            dropped += len(self.frames)
+            self.frames = []
+        self.coaddition.update({key: value for key, value in job.coaddition.items() if key != 'reset'})
+        self.coaddition['reset'] = self.coaddition.get('reset', False) or job.coaddition.get('reset', False)
+        self.process = self.process or job.process
+        if job.submitted is not None:
+            self.submitted = job.submitted
+
+        if job.frames:
+            if fold and all(same_sweep(frame, job.frames[0]) for frame in self.frames):
+                self.frames.extend(job.frames)
+            else:
+                dropped += len(self.frames)
+                self.frames = list(job.frames)
+            self.replay = None
+        if job.replay is not None:
+            if self.frames:  # same acquisition as the last pending frame, with updated reference/position
+                self.frames[-1] = job.replay
+            else:
+                self.replay = job.replay
+        return dropped
+
+
+class PipelineWorker(QObject):
+    """Runs the jobs on its pipeline and emits the results
+
+    Signals
+    -------
+    result_ready: (FTIRResult, list of str, dict, dict) a shallow copy of the pipeline result, the recomputed stages,
+        the timings of the stages in seconds and information about the frames: number of frames in the job
+        (frames), number of co-added sweeps (coadded), last alignment shift (last_shift) and perf_counter time at
+        which the latest data was submitted (submitted, None if the job had no data)
+    """
+
+    result_ready = Signal(object, list, dict, dict)
+
+    def __init__(self, pipeline, mailbox):
+        super().__init__()
+        self.pipeline = pipeline
+        self.mailbox = mailbox
+        self.coadder = CoAdder()
+        self.coadd = False
+        self._coadded_frame = None  # a frame of the co-added sweeps, for their axis and direction
+
+    @Slot()
+    def run_pending(self):
+        job = self.mailbox.take()
+        if job is not None:
+            self.run_job(job)
+
+    def configure_coaddition(self, coaddition):
+        if coaddition.get('reset', False):
+            self.coadder.reset()
+            self._coadded_frame = None
+        if 'enabled' in coaddition:
+            self.coadd = coaddition['enabled']
+        if 'max_shift' in coaddition:
+            self.coadder.max_shift = coaddition['max_shift']
+
+    def resampled(self, frame):
+        """True if the delay axis of the frame is built from its own reference or position trace
+
+        Such frames are not co-added: the average would be resampled on the fringes or positions of the last sweep
+        only, while each sweep was shifted by a different amount.
+        """
+        return (self.pipeline.resample and frame.get('reference') is not None) or \
+            (self.pipeline.use_position and frame.get('position') is not None)
+
+    def add_frame(self, frame):
+        """Adds the trace of the frame to the co-addition and returns the running average
+
+        If the acquisition axis or the sweep direction of the frame differ from the ones of the co-added sweeps, the
+        co-addition restarts from this frame.
+        """
+        if self._coadded_frame is not None and not same_sweep(frame, self._coadded_frame):
+            logger.info('The acquisition axis or the sweep direction changed, the co-addition restarts')
+            self.coadder.reset()
+        self._coadded_frame = frame
+        return self.coadder.add(frame['y_raw'])
+
+    def run_job(self, job: ProcessingJob):
+        self.configure_coaddition(job.coaddition)
+        for name, value in job.parameters.items():
+            try:
+                setattr(self.pipeline, name, value)
+            except ValueError as e:
+                logger.warning(f'Could not set the {name} parameter: {str(e)}')
+
+        data = None
+        for frame in job.frames:
+            data = dict(frame, y_raw=self.add_frame(frame)) if self.coadd and not self.resampled(frame) \
+                else frame
+        if job.replay is not None:
+            data = job.replay
+            if self.coadd and self.coadder.count > 0 and not self.resampled(data):
+                data = dict(job.replay, y_raw=self.coadder.average)
+        if data is not None:
+            self.pipeline.set_data(**{key: value for key, value in data.items() if key != 'direction'})
+
+        if not job.process or self.pipeline.result.y_raw is None:
+            return
+        try:
+            self.pipeline.update()
+        except Exception as e:
+            logger.debug(f'Could not process the raw data: {str(e)}')
+        # the stages replace the arrays of the result, they do not modify them, so a shallow copy is a snapshot
+        self.result_ready.emit(copy.copy(self.pipeline.result), list(self.pipeline.updated_stages),
+                               dict(self.pipeline.timings),
+                               dict(frames=len(job.frames), coadded=self.coadder.count,
+                                    last_shift=self.coadder.last_shift, submitted=job.submitted))
+
+
+class PipelineThread(QObject):
+    """Starts a PipelineWorker in a dedicated QThread and hands the jobs to it through a coalescing mailbox
+
+    Attributes
+    ----------
+    received: (int) number of new frames submitted
+    dropped: (int) number of new frames discarded because a more recent one arrived before they were processed (and
+        could not be co-added with it)
+
+    Signals
+    -------
+    result_ready: see PipelineWorker
+    """
+
+    job_pending = Signal()
+    result_ready = Signal(object, list, dict, dict)
+
+    def __init__(self, pipeline):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._pending = None
+        self._fold = False
+        self.received = 0
+        self.dropped = 0
+
+        self._thread = QThread()
+        self.worker = PipelineWorker(pipeline, self)
+        self.worker.moveToThread(self._thread)
+        self.job_pending.connect(self.worker.run_pending)
+        self.worker.result_ready.connect(self.result_ready.emit)
+        self._thread.start()
+
+    def reset_counters(self):
+        with self._lock:
+            self.received = 0
+            self.dropped = 0
+
+    def submit(self, job: ProcessingJob):
+        """Posts the job to the worker thread, merging it with the pending one if any. Returns immediately"""
+        with self._lock:
+            self.received += len(job.frames)
+            self._fold = job.coaddition.get('enabled', self._fold)
+            if self._pending is not None:
+                self.dropped += self._pending.merge(job, fold=self._fold)
+                return
+            self._pending = job
+        self.job_pending.emit()
+
+    def take(self):
+        """Called by the worker: removes and returns the pending job"""
+        with self._lock:
+            job, self._pending = self._pending, None
+        return job
+
+    def quit(self):
+        self._thread.quit()
+        self._thread.wait()
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_ftir.processing.calibration import FringeCalibrator
+
+
+def fringes(period, npts=4096):
+    return np.cos(2 * np.pi * np.arange(npts) / period)
+
+
+def test_period_is_cached_until_it_drifts():
+    calibrator = FringeCalibrator(tolerance=1e-3)
+    assert calibrator.update(fringes(10.)) == pytest.approx(10., rel=1e-4)
+    assert calibrator.update(fringes(10.002)) == pytest.approx(10., rel=1e-4)  # within the tolerance
+    assert calibrator.estimations == 1
+    assert calibrator.update(fringes(10.2)) == pytest.approx(10.2, rel=1e-4)
+    assert calibrator.estimations == 2
+
+
+def test_period_is_estimated_again_on_length_change():
+    calibrator = FringeCalibrator()
+    calibrator.update(fringes(10.))
+    calibrator.update(fringes(10., npts=2048))
+    assert calibrator.estimations == 2
+    calibrator.reset()
+    assert calibrator.period is None
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_ftir.processing.coaddition import CoAdder, estimate_shift, fractional_shift
+
+NPTS = 1024
+NOISE = 0.1
+
+
+def template():
+    n = np.arange(NPTS)
+    return np.exp(-((n - NPTS / 2) / 40) ** 2) * np.cos(2 * np.pi * n / 10)
+
+
+def test_known_shift_is_recovered():
+    assert estimate_shift(fractional_shift(template(), 3.4), template()) == pytest.approx(3.4, abs=0.02)
+
+
+@pytest.mark.parametrize('count', [4, 16, 64])
+def test_residual_noise_decreases_as_square_root(count):
+    rng = np.random.default_rng(0)
+    coadder = CoAdder(max_shift=20)
+    for _ in range(count):
+        coadder.add(fractional_shift(template(), rng.uniform(-5, 5)) + NOISE * rng.standard_normal(NPTS))
+    average = coadder.average
+    residual = fractional_shift(average, -estimate_shift(average, template())) - template()
+    assert coadder.count == count
+    assert np.std(residual[100:-100]) == pytest.approx(NOISE / np.sqrt(count), rel=0.25)
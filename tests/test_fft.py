@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from pymodaq.utils.units import l2w
+
+from pymodaq_plugins_ftir.processing import FTIRPipeline
+from pymodaq_plugins_ftir.processing import fft as ftir_fft
+
+SCALING = 0.09186
+
+
+def interferogram(x, wavelength=800., dx=50.):
+    """Gaussian envelope of FWHM dx (fs) times the fringes of a light of wavelength (nm), centered on the axis x"""
+    delay = (x - np.mean(x)) * SCALING
+    return np.exp(-4 * np.log(2) * (delay / dx) ** 2) * np.cos(delay * l2w(wavelength))
+
+
+def test_frequency_axes_are_cached_and_read_only():
+    omega = ftir_fft.real_frequency_axis(1000, 91.86)
+    assert ftir_fft.real_frequency_axis(1000, 91.86) is omega
+    assert not omega.flags.writeable
+    assert len(omega) == ftir_fft.fast_length(1000) // 2 + 1
+    assert ftir_fft.complex_frequency_axis(1000, 91.86) is ftir_fft.complex_frequency_axis(1000, 91.86)
+
+
+def test_real_and_complex_modes_give_the_same_spectrum():
+    x = np.arange(4096)
+    y_raw = interferogram(x)
+    peaks = []
+    for fft_mode in ftir_fft.FFT_MODES:
+        result = FTIRPipeline(scaling=SCALING, fft_mode=fft_mode).process(y_raw, x)
+        index = np.argmax(result.spectrum)
+        peaks.append((abs(result.omega[index]), result.spectrum[index]))
+    np.testing.assert_allclose([peak[0] for peak in peaks], l2w(800.), rtol=0.02)
+    np.testing.assert_allclose(peaks[0][1], peaks[1][1], rtol=0.02)
+
+
+def test_mertz_spectrum_is_normalized_as_the_double_sided_one():
+    step, npts, core = 0.1, 2000, 100
+    delay = np.arange(-npts, npts + 1) * step
+    y_double = np.exp(-(delay / 20) ** 2) * np.cos(2.36 * delay)
+    omega, spectrum = ftir_fft.real_spectrum(y_double, 2 * npts * step)
+
+    y_one_sided = y_double[npts - core:]
+    ramp = np.clip((np.arange(len(y_one_sided)) - core) / core + 1, 0, 2) / 2
+    y_core = y_double[npts - core:npts + core + 1] * (1 - np.abs(np.arange(-core, core + 1)) / (core + 1))
+    omega_mertz, spectrum_mertz = ftir_fft.mertz_spectrum(y_one_sided * ramp, y_core, core,
+                                                          (len(y_one_sided) - 1) * step)
+    np.testing.assert_allclose(np.interp(omega, omega_mertz, spectrum_mertz), spectrum, atol=0.03 * spectrum.max())
+
+
+def test_mertz_forward_and_reversed_sweeps():
+    x = np.arange(6001)
+    y_raw = interferogram(x)[2800:]  # ZPD 200 samples after the start
+    pipeline = FTIRPipeline(scaling=SCALING, phase_correction='mertz')
+    forward = pipeline.process(y_raw)
+    reversed_ = pipeline.process(y_raw[::-1])
+    assert abs(forward.omega[np.argmax(forward.spectrum)]) == pytest.approx(l2w(800.), rel=0.01)
+    np.testing.assert_allclose(reversed_.spectrum, forward.spectrum, atol=1e-6 * forward.spectrum.max())
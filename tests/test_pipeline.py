@@ -0,0 +1,55 @@
+import numpy as np
+
+from pymodaq.utils.units import l2w
+
+from pymodaq_plugins_ftir.processing import FTIRPipeline
+from pymodaq_plugins_ftir.processing.pipeline import STAGES
+
+SCALING = 0.09186
+
+
+def interferogram(x, wavelength=800., dx=50.):
+    """Gaussian envelope of FWHM dx (fs) times the fringes of a light of wavelength (nm), centered on the axis x"""
+    delay = (x - np.mean(x)) * SCALING
+    return np.exp(-4 * np.log(2) * (delay / dx) ** 2) * np.cos(delay * l2w(wavelength))
+
+
+def peak_frequency(pipeline):
+    return pipeline.result.omega[np.argmax(np.abs(pipeline.result.spectrum))]
+
+
+def test_set_data_reprocesses_new_traces():
+    pipeline = FTIRPipeline(scaling=SCALING)
+    x = np.arange(4096)
+    peaks = []
+    for wavelength in (800., 600., 1000.):
+        pipeline.set_data(interferogram(x, wavelength), x)
+        pipeline.update()
+        peaks.append(abs(peak_frequency(pipeline)))
+    np.testing.assert_allclose(peaks, 2 * np.pi * 299.792458 / np.array([800., 600., 1000.]), rtol=0.02)
+
+
+def test_batch_equals_row_by_row_processing():
+    x = np.arange(4096)
+    rows = np.stack([interferogram(x, wavelength)
+                     for wavelength in (700., 800., 900.)])
+    pipeline = FTIRPipeline(scaling=SCALING)
+    batch = pipeline.process_batch(rows, x)
+    for ind, row in enumerate(rows):
+        result = pipeline.process(row, x)
+        np.testing.assert_allclose(batch.y_corrected[ind], result.y_corrected)
+        np.testing.assert_allclose(batch.spectrum[ind], result.spectrum, atol=1e-12)
+        np.testing.assert_allclose(batch.spectrum_wl[ind], result.spectrum_wl, atol=1e-12)
+
+
+def test_roi_change_only_recomputes_the_wavelength_stage():
+    x = np.arange(4096)
+    pipeline = FTIRPipeline(scaling=SCALING)
+    pipeline.set_data(interferogram(x), x)
+    assert pipeline.update() == list(STAGES)
+    pipeline.spectral_roi = (1.5, 3.5)
+    assert pipeline.update() == ['wavelength']
+    pipeline.spectral_roi = (1.5, 3.5)  # same value
+    assert pipeline.update() == []
+    pipeline.apodization_window = (-20., 20.)
+    assert pipeline.update() == ['filtering', 'fft', 'wavelength']
@@ -0,0 +1,28 @@
+import numpy as np
+from scipy.constants import speed_of_light
+
+from pymodaq_plugins_ftir.processing.resampling import resample_on_fringes, zero_crossings
+
+REFERENCE_WAVELENGTH = 632.
+NPTS = 20000
+
+
+def fringes(delay, wavelength):
+    return np.cos(2 * np.pi * speed_of_light * 1e-6 * delay / wavelength)
+
+
+def crossing_ripple(y):
+    """Relative spread of the spacing of the zero crossings of y"""
+    spacing = np.diff(zero_crossings(y))
+    return np.std(spacing) / np.mean(spacing)
+
+
+def test_fringe_resampling_removes_the_velocity_ripple():
+    n = np.arange(NPTS)
+    # the stage velocity ripples by +-30% along the sweep
+    delay = 0.05 * (n + 0.3 * NPTS / (6 * np.pi) * np.sin(6 * np.pi * n / NPTS))
+    y = fringes(delay, 800.)
+    delay_grid, y_resampled = resample_on_fringes(y, fringes(delay, REFERENCE_WAVELENGTH), REFERENCE_WAVELENGTH)
+    assert crossing_ripple(y) > 0.1
+    assert crossing_ripple(y_resampled) < 1e-3
+    np.testing.assert_allclose(np.diff(delay_grid), np.diff(delay_grid)[0])
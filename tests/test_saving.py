@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_ftir.saving import FTIRWriter, ROOT_GROUP, SEGMENT_PREFIX
+
+h5py = pytest.importorskip('h5py')
+
+
+def write_sweeps(file_path, lengths, queue_size=64):
+    writer = FTIRWriter('h5py', queue_size=queue_size)
+    writer.open(file_path)
+    rng = np.random.default_rng(0)
+    sweeps = [rng.random(npts) for npts in lengths]
+    for sweep in sweeps:
+        assert writer.write(block=True, raw=sweep, delay=np.arange(len(sweep), dtype=float))
+    writer.close()
+    return writer, sweeps
+
+
+def test_sweeps_are_appended_as_rows(tmp_path):
+    writer, sweeps = write_sweeps(tmp_path.joinpath('sweeps.h5'), [256] * 5)
+    assert (writer.written, writer.dropped) == (5, 0)
+    with h5py.File(tmp_path.joinpath('sweeps.h5'), 'r') as f:
+        np.testing.assert_array_equal(f[f'{ROOT_GROUP}/{SEGMENT_PREFIX}000/raw'][...], np.stack(sweeps))
+        assert f[f'{ROOT_GROUP}/{SEGMENT_PREFIX}000/delay'].shape == (5, 256)
+
+
+def test_new_segment_when_the_length_changes(tmp_path):
+    writer, sweeps = write_sweeps(tmp_path.joinpath('sweeps.h5'), [256, 256, 128, 128, 128])
+    with h5py.File(tmp_path.joinpath('sweeps.h5'), 'r') as f:
+        assert sorted(f[ROOT_GROUP].keys()) == [f'{SEGMENT_PREFIX}000', f'{SEGMENT_PREFIX}001']
+        np.testing.assert_array_equal(f[f'{ROOT_GROUP}/{SEGMENT_PREFIX}000/raw'][...], np.stack(sweeps[:2]))
+        np.testing.assert_array_equal(f[f'{ROOT_GROUP}/{SEGMENT_PREFIX}001/raw'][...], np.stack(sweeps[2:]))
+
+
+def test_blocking_writes_are_never_dropped(tmp_path):
+    writer, sweeps = write_sweeps(tmp_path.joinpath('sweeps.h5'), [4096] * 100, queue_size=2)
+    assert (writer.written, writer.dropped) == (100, 0)
+
+
+def test_writes_are_refused_when_not_open():
+    writer = FTIRWriter('h5py')
+    assert not writer.write(raw=np.zeros(8))
+
+
+def test_reloaded_sweeps_keep_their_delay_axis(tmp_path):
+    from pymodaq_plugins_ftir.loading import LazyInterferograms
+    from pymodaq_plugins_ftir.processing.pipeline import FTIRPipeline
+
+    scaling = 0.2
+    x_raw = np.arange(512)
+    y_raw = np.cos(2 * np.pi * x_raw * scaling / 2.) * np.exp(-((x_raw - 256) * scaling / 20) ** 2)
+    result = FTIRPipeline(scaling=scaling).process(y_raw, x_raw)
+    writer = FTIRWriter('h5py')
+    writer.open(tmp_path.joinpath('sweeps.h5'))
+    writer.write(block=True, raw=result.y_delay, delay=result.x_delay)
+    writer.close()
+
+    loader = LazyInterferograms(tmp_path.joinpath('sweeps.h5'), f'/{ROOT_GROUP}/{SEGMENT_PREFIX}000/raw', 'h5py')
+    step = loader.delay_step(0)
+    assert step == pytest.approx(scaling)
+    # processed with another manual scaling, the one stored with the sweep prevails
+    reloaded = FTIRPipeline(scaling=1.).process(loader.rows(0), loader.delay(0) / step, scaling=step)
+    loader.close()
+    np.testing.assert_allclose(reloaded.x_delay, result.x_delay)
+    np.testing.assert_allclose(reloaded.spectrum, result.spectrum)
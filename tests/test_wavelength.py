@@ -0,0 +1,35 @@
+import numpy as np
+
+from pymodaq.utils.units import l2w
+
+from pymodaq_plugins_ftir.processing import FTIRPipeline
+from pymodaq_plugins_ftir.processing.wavelength import wavelength_map
+
+SCALING = 0.09186
+GRID = (700., 900., 401)
+
+
+def interferogram(x, wavelength=800., dx=50.):
+    """Gaussian envelope of FWHM dx (fs) times the fringes of a light of wavelength (nm), centered on the axis x"""
+    delay = (x - np.mean(x)) * SCALING
+    return np.exp(-4 * np.log(2) * (delay / dx) ** 2) * np.cos(delay * l2w(wavelength))
+
+
+def test_uniform_grid_matches_the_frequency_samples():
+    x = np.arange(4096)
+    y_raw = interferogram(x)
+    result = FTIRPipeline(scaling=SCALING, fft_mode='real').process(y_raw, x)
+    uniform = FTIRPipeline(scaling=SCALING, fft_mode='real', wavelength_grid=GRID).process(y_raw, x)
+    np.testing.assert_allclose(uniform.wavelength, np.linspace(*GRID))
+    np.testing.assert_allclose(uniform.spectrum_wl, np.interp(uniform.wavelength, result.wavelength,
+                                                              result.spectrum_wl), atol=0.01)
+
+
+def test_wavelength_map_is_cached():
+    x = np.arange(4096)
+    y_raw = interferogram(x)
+    pipeline = FTIRPipeline(scaling=SCALING, fft_mode='real', wavelength_grid=GRID)
+    wavelength_map.cache_clear()
+    pipeline.process(y_raw, x)
+    pipeline.process(0.5 * y_raw, x)
+    assert (wavelength_map.cache_info().misses, wavelength_map.cache_info().hits) == (1, 1)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_ftir.processing.pipeline import FTIRPipeline
+from pymodaq_plugins_ftir.worker import ProcessingJob, PipelineWorker
+
+
+def frame(value, npts=64, direction='forward'):
+    x_raw = np.arange(npts)
+    return dict(y_raw=value * np.exp(-((x_raw - npts / 2) / 4) ** 2), x_raw=x_raw, direction=direction)
+
+
+def test_only_the_latest_frame_is_kept():
+    pending = ProcessingJob(data=frame(0))
+    dropped = sum(pending.merge(ProcessingJob(data=frame(ind))) for ind in range(1, 4))
+    assert dropped == 3
+    assert [f['y_raw'].max() for f in pending.frames] == [3]
+
+
+def test_parameters_are_coalesced():
+    pending = ProcessingJob(parameters=dict(scaling=0.1, zpd_window=(0, 1)))
+    pending.merge(ProcessingJob(parameters=dict(scaling=0.2)))
+    assert pending.parameters == dict(scaling=0.2, zpd_window=(0, 1))
+
+
+def test_matching_frames_are_folded():
+    pending = ProcessingJob(data=frame(0))
+    dropped = sum(pending.merge(ProcessingJob(data=frame(ind)), fold=True) for ind in range(1, 4))
+    assert dropped == 0
+    assert [f['y_raw'].max() for f in pending.frames] == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('other', [frame(1, direction='backward'), frame(1, npts=32)])
+def test_frames_of_another_sweep_are_not_folded(other):
+    pending = ProcessingJob(data=frame(0))
+    assert pending.merge(ProcessingJob(data=other), fold=True) == 1
+    assert len(pending.frames) == 1 and pending.frames[0] is other
+
+
+def test_coaddition_restarts_when_the_direction_changes():
+    worker = PipelineWorker(FTIRPipeline(), None)
+    worker.configure_coaddition(dict(enabled=True))
+    worker.add_frame(frame(1))
+    np.testing.assert_allclose(worker.add_frame(frame(3)), frame(2)['y_raw'], atol=1e-9)
+    np.testing.assert_allclose(worker.add_frame(frame(5, direction='backward')), frame(5)['y_raw'])
+    assert worker.coadder.count == 1
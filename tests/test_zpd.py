@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_ftir.processing.zpd import locate_zpd
+
+ZPD = 100
+
+
+@pytest.mark.parametrize('offset', [0.3, -0.4])
+def test_zpd_below_the_sampling_step(offset):
+    n = np.arange(2 * ZPD + 1) - ZPD - offset
+    y = np.exp(-(n / 15) ** 2) * np.cos(2 * np.pi * n / 12)
+    assert locate_zpd(y[None, :], 'integer')[0] == ZPD
+    assert locate_zpd(y[None, :], 'parabolic')[0] == pytest.approx(ZPD + offset, abs=0.02)
+    assert locate_zpd(y[None, :], 'envelope')[0] == pytest.approx(ZPD + offset, abs=0.02)
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        locate_zpd(np.ones((1, 8)), 'centroid')